@@ -4,6 +4,7 @@ from AlgorithmImports import *
 from universe import FaangUniverseSelectionModel
 from alpha import NewsSentimentAlphaModel
 from portfolio import PartitionedPortfolioConstructionModel
+from talib.portfolio_state import PortfolioStateCache
 # endregion
 
 class BreakingNewsEventsAlgorithm(QCAlgorithm):
@@ -24,9 +25,13 @@ class BreakingNewsEventsAlgorithm(QCAlgorithm):
         # We use 5 partitions because the FAANG universe has 5 members.
         # If we change the universe to have, say, 100 securities, then 100 paritions means
         #  that each trade gets a 1% (1/100) allocation instead of a 20% (1/5) allocation.
-        self.SetPortfolioConstruction(PartitionedPortfolioConstructionModel(self, universe.Count))
+        self.portfolio_state = PortfolioStateCache(self)
+        self.SetPortfolioConstruction(PartitionedPortfolioConstructionModel(self, universe.Count, self.portfolio_state))
 
         self.AddRiskManagement(NullRiskManagementModel())
 
         self.SetExecution(ImmediateExecutionModel()) 
 
+    def OnOrderEvent(self, orderEvent):
+        self.portfolio_state.on_order_event(orderEvent)
+
@@ -5,9 +5,11 @@ from AlgorithmImports import *
 
 class PartitionedPortfolioConstructionModel(PortfolioConstructionModel):
     
-    def __init__(self, algorithm, num_partitions):
+    def __init__(self, algorithm, num_partitions, portfolio_state):
         self.algorithm = algorithm
         self.NUM_PARTITIONS = num_partitions
+        # Invested symbols and directions, maintained from fills (talib.portfolio_state)
+        self.portfolio_state = portfolio_state
 
     # REQUIRED: Will determine the target percent for each insight
     def DetermineTargetPercent(self, activeInsights: List[Insight]) -> Dict[Insight, float]:        
@@ -69,26 +71,25 @@ class PartitionedPortfolioConstructionModel(PortfolioConstructionModel):
         #  Case 4: There is an insight for a security we're not currently invested in AND there is an available parition in the portfolio
 
         last_active_insights = self.GetTargetInsights() # Warning: This assumes that all insights have the same duration
-        insight_symbols = [insight.Symbol for insight in last_active_insights]
-        num_investments = 0
-        for symbol, security_holding in self.algorithm.Portfolio.items():
-            if not security_holding.Invested:
-                continue
-            num_investments += 1
+        insight_symbols = {insight.Symbol for insight in last_active_insights}
+        portfolio_state = self.portfolio_state
+        portfolio_state.maybe_reconcile()
+        num_investments = len(portfolio_state)
+        for symbol in portfolio_state.invested:
             #  Case 1: A security we're invested in was removed from the universe
             #  Case 2: The latest insight for a Symbol we're invested in has expired
             if symbol not in insight_symbols:
                 return True
         
         for insight in last_active_insights:
-            security_holding = self.algorithm.Portfolio[insight.Symbol]
+            symbol = insight.Symbol
             #  Case 3: The insight direction for a security we're invested in has changed
-            if security_holding.IsShort and insight.Direction == InsightDirection.Up \
-                or security_holding.IsLong and insight.Direction == InsightDirection.Down:
+            if portfolio_state.is_short(symbol) and insight.Direction == InsightDirection.Up \
+                or portfolio_state.is_long(symbol) and insight.Direction == InsightDirection.Down:
                 return True
 
             #  Case 4: There is an insight for a security we're not currently invested in AND there is an available parition in the portfolio
-            if not security_holding.Invested and num_investments < self.NUM_PARTITIONS:
+            if not portfolio_state.is_invested(symbol) and num_investments < self.NUM_PARTITIONS:
                 return True
 
         return False
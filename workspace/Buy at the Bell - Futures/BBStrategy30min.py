@@ -18,6 +18,7 @@ from System.Drawing import Color
 
 import decimal as d
 import numpy as np
+from talib.brackets import BracketManager
 
 ##BB30
 #             
@@ -101,11 +102,10 @@ class FormalFluorescentYellowArmadillo(QCAlgorithm):
         self.state = 0                
 
         # Order management
+        # stop loss and take profit legs cancel each other, max_trade_intervals becomes the bracket expiry
+        self.brackets = BracketManager(self)
         self.last_order_time = self.UtcTime
         self.quant = 0
-        self.order = 0
-        self.sl = 0
-        self.tp = 0
 
         self.last_open = 0
         self.last_high = 0
@@ -140,30 +140,35 @@ class FormalFluorescentYellowArmadillo(QCAlgorithm):
             # 30% risk!
             self.quant = int((self.investment * 0.3) / self.price_consolidated)
 
-            # Buy orders
-            ticket = self.MarketOrder(self.symbol, self.quant, tag=self.Time.strftime(str_format))
-
             # From https://www.quantconnect.com/forum/discussion/1072/setting-a-stop-loss-and-take-profit/p2
             # Should be entry price, not current price!
             tp = self.price_consolidated + (self.atr_consolidated.Current.Price * 1.6)
             stop = self.price_consolidated - (self.atr_consolidated.Current.Price * 1.8)
-        
-            self.sl = self.StopMarketOrder(self.symbol, -self.quant, stop)
-            self.tp = self.LimitOrder(self.symbol, -self.quant, tp)
+
+            expiry = None
+            if self.max_trade_intervals != None:
+                expiry = self.Time + timedelta(seconds=self.max_trade_intervals * self.interval_in_seconds)
+
+            # Buy orders, with the stop loss and take profit placed once the entry fills
+            bracket = self.brackets.open(self.symbol, self.quant, stop_price=stop, target_price=tp, expiry=expiry,
+                                         tag=self.Time.strftime(str_format))
+            self.ThirtyMinuteTrigger = False
+            if bracket is None:
+                self.state = 0
+                return
+            ticket = bracket.entry_ticket
 
             self.last_order_time = self.UtcTime
 
             self.state = 3
             self.Debug(f"{self.Time}: Quantity filled: {ticket.QuantityFilled}; Fill price: {ticket.AverageFillPrice}")
-            self.ThirtyMinuteTrigger = False
 
         if self.state == 3:
-            if self.max_trade_intervals != None:
-                c = self.UtcTime - self.last_order_time
-                if c.seconds > (self.max_trade_intervals * self.interval_in_seconds):
-                    self.Debug(f"{self.Time}: Selling! Time since filled: {c.seconds}")
-                    self.ClosePosition()
-                    self.state = 0
+            for symbol in self.brackets.expire(self.Time):
+                self.Debug(f"{self.Time}: Selling! Time since filled: {(self.UtcTime - self.last_order_time).seconds}")
+            # Stopped out, took profit or expired
+            if self.symbol not in self.brackets:
+                self.state = 0
         
         # Only fire every 30 minutes
         if self.ThirtyMinuteTrigger == True:
@@ -226,6 +231,7 @@ class FormalFluorescentYellowArmadillo(QCAlgorithm):
             self.Liquidate(self.symbol)
 
     def OnOrderEvent(self, orderEvent: OrderEvent) -> None:
+        self.brackets.on_order_event(orderEvent)
         order = self.Transactions.GetOrderById(orderEvent.OrderId)
         # CancelPending 8
         # Canceled = 5
@@ -14,6 +14,7 @@
 from AlgorithmImports import *
 from System.Collections.Generic import List
 from QuantConnect.Indicators import BollingerBands
+from talib.indicator_bank import IndicatorBank
 
 ### <summary>
 ### Demonstration of using coarse and fine universe selection together to filter down a smaller universe of stocks.
@@ -122,6 +123,9 @@ class IntradayReversalAlphaModel(AlphaModel):
         self.period_sma = period_sma
         self.resolution = resolution
         self.cache = {} # Cache for SymbolData
+        # BB(30,2), RSI(14) and ATR(1) of every symbol, updated once per bar
+        self.indicators = IndicatorBank(bb_period=30, bb_k=2, rsi_period=14, atr_period=1,
+                                        rsi_average="wilders", atr_average="simple")
         self.Name = 'IntradayReversalAlphaModel'
 
     def Update(self, algorithm, data):
@@ -129,6 +133,8 @@ class IntradayReversalAlphaModel(AlphaModel):
         #timeToClose = algorithm.Time.replace(hour=15, minute=1, second=0)
         timeToClose = algorithm.Time.replace(day=20)
 
+        self.indicators.update(data.Bars)
+
         insights = []
         for kvp in algorithm.ActiveSecurities:
 
@@ -159,7 +165,7 @@ class IntradayReversalAlphaModel(AlphaModel):
         Simplified in this example as there is 1 asset.'''
         
         for security in changes.AddedSecurities:
-            self.cache[security.Symbol] = SymbolData(algorithm, security.Symbol, self.period_sma, self.resolution)
+            self.cache[security.Symbol] = SymbolData(algorithm, security.Symbol, self.period_sma, self.resolution, self.indicators)
 
         #for security in changes.RemovedSecurities:
         #    self.cache.pop(security.Symbol)
@@ -170,31 +176,18 @@ class IntradayReversalAlphaModel(AlphaModel):
         return algorithm.Securities[symbol].HasData and timeOfDay >= time(10) and timeOfDay <= time(15)
 
 class SymbolData:
-    def __init__(self, algorithm, symbol, period_sma, resolution):
+    def __init__(self, algorithm, symbol, period_sma, resolution, indicators):
         self.symbol = symbol
         self.PreviousDirection = InsightDirection.Flat
         self.priceSMA = algorithm.SMA(symbol, period_sma, resolution)        
             
-        #Bollinger Bands
-        # 30 bars
-        self.bb = algorithm.BB(symbol, 30, 2, MovingAverageType.Simple, resolution)
-
-        #Relative Strength Index
-        # Last 14 candles
-        self.rsi = algorithm.RSI(symbol, 14, resolution)
-                
-        #Average True Range
-        self.atr = algorithm.ATR(symbol, 1, MovingAverageType.Simple, resolution)
+        #Bollinger Bands (30 bars), Relative Strength Index (last 14 candles) and Average True Range
+        # come from the shared IndicatorBank, which is fed by the owner once per bar
+        self.indicators = indicators
+        indicators.add(symbol)
 
-        #RSI History
-        self.rsi_window = RollingWindow[RelativeStrengthIndex](3)
-
-        #Bollinger Bandwidth History
-        # (Upper - Lower) / Middle
-        self.bbandwidth_window = RollingWindow[BollingerBands](3)
-
-        #ATR History
-        self.atr_window = RollingWindow[AverageTrueRange](3)
+        # Number of bars with all indicators ready
+        self.ready_bars = 0
 
         # Need to store some recent historical TradeBar data
         self.trade_bar_window = RollingWindow[TradeBar](3)
@@ -213,21 +206,20 @@ class SymbolData:
         for trade_bar in history_trade_bar:
             self.trade_bar_window.Add(trade_bar)
 
-        if self.priceSMA.IsReady and self.bb.IsReady and self.rsi.IsReady and self.atr.IsReady:
-            self.bbandwidth_window.Add(self.bb)
-            self.rsi_window.Add(self.rsi)
-            self.atr_window.Add(self.atr)
-
-            if self.bbandwidth_window.Count < 3:                
+        if self.priceSMA.IsReady and self.indicators.is_ready(self.symbol):
+            # The indicator windows used to hold references to the live indicators, so every
+            # entry read the current value: use the current values once three bars were ready
+            self.ready_bars += 1
+            if self.ready_bars < 3:                
                 return
 
-            self.bbandwidth = (self.bbandwidth_window[2].UpperBand.Current.Value - self.bbandwidth_window[2].LowerBand.Current.Value) / self.bbandwidth_window[2].MiddleBand.Current.Value
-            #self.bbandwidth = (self.bb.UpperBand.Current.Value - self.bb.LowerBand.Current.Value) / self.bb.MiddleBand.Current.Value
+            values = self.indicators.values(self.symbol)
+            self.bbandwidth = values["bandwidth"]
 
             c0 = self.trade_bar_window[2].Close < self.trade_bar_window[2].Open
-            c1 = self.trade_bar_window[2].Low < self.bbandwidth_window[2].LowerBand.Current.Value
+            c1 = self.trade_bar_window[2].Low < values["lower"]
             
-            c3 = self.rsi_window[2].Current.Value < 25
+            c3 = values["rsi"] < 25
             c4 = self.trade_bar_window[1].Close > self.trade_bar_window[1].Open
             c5 = self.trade_bar_window[1].Close > self.trade_bar_window[2].High
             c6 = self.bbandwidth >= 0.27
@@ -246,8 +238,8 @@ class SymbolData:
 
                     # From https://www.quantconnect.com/forum/discussion/1072/setting-a-stop-loss-and-take-profit/p2
                     # Should be entry price, not current price!
-                    tp = price + (self.atr_window[1].Current.Price * 1.4)
-                    stop = price - (self.atr_window[1].Current.Price * 1.8)
+                    tp = price + (values["atr"] * 1.4)
+                    stop = price - (values["atr"] * 1.8)
                 
                     self.sl = algorithm.StopMarketOrder(self.symbol, -self.quant, stop)
                     self.tp = algorithm.LimitOrder(self.symbol, -self.quant, tp)
@@ -2,6 +2,7 @@ from AlgorithmImports import *
 from QuantConnect.Data.UniverseSelection import *
 import pandas as pd
 import numpy as np
+from ranking import CloseMatrix, quantile_labels
 
 class EnhancedShortTermMeanReversionAlgorithm(QCAlgorithm):
 
@@ -26,12 +27,25 @@ class EnhancedShortTermMeanReversionAlgorithm(QCAlgorithm):
         self.nq_vol = 3
         # the symbol list after the coarse and fine universe selection
         self.universe = None
-        
+        # number of stocks taken by dollar volume
+        self.universe_size = int(self.GetParameter("universe_size") or 50)
+        # last six daily closes of the universe, rolled forward once a day
+        self.close_matrix = CloseMatrix(6)
+
+        # daily SPY close and its 75 day mean for the velocity filter, seeded once
+        self.spy_mean = SimpleMovingAverage(75)
+        self.spy_close = 0
+        spy_daily = TradeBarConsolidator(timedelta(days=1))
+        spy_daily.DataConsolidated += self.on_spy_daily
+        self.SubscriptionManager.AddConsolidator("SPY", spy_daily)
+        spy_history = self.History(["SPY"], 75, Resolution.Daily)
+        if not spy_history.empty:
+            for time, close in spy_history.loc["SPY"]['close'].items():
+                self.spy_mean.Update(time, close)
+                self.spy_close = close
+
         self.Schedule.On(self.DateRules.MonthStart("SPY"), self.TimeRules.At(0, 0), Action(self.monthly_rebalance))
-        self.Schedule.On(self.DateRules.EveryDay("SPY"), self.TimeRules.BeforeMarketClose("SPY", 303), Action(self.get_prices))
-        self.Schedule.On(self.DateRules.EveryDay("SPY"), self.TimeRules.BeforeMarketClose("SPY", 302), Action(self.daily_rebalance))
-        self.Schedule.On(self.DateRules.EveryDay("SPY"), self.TimeRules.BeforeMarketClose("SPY", 301), Action(self.short))
-        self.Schedule.On(self.DateRules.EveryDay("SPY"), self.TimeRules.BeforeMarketClose("SPY", 300), Action(self.long))
+        self.Schedule.On(self.DateRules.EveryDay("SPY"), self.TimeRules.BeforeMarketClose("SPY", 303), Action(self.rebalance))
     
     def monthly_rebalance(self):
         # rebalance the universe every month
@@ -42,10 +56,10 @@ class EnhancedShortTermMeanReversionAlgorithm(QCAlgorithm):
         if self.rebalence_flag or self.first_month_trade_flag:
             # drop stocks which have no fundamental data or have too low prices
             selected = [x for x in coarse if (x.HasFundamentalData) and (float(x.Price) > 5)]
-            # rank the stocks by dollar volume and choose the top 50
+            # rank the stocks by dollar volume and choose the top universe_size
             filtered = sorted(selected, key=lambda x: x.DollarVolume, reverse=True) 
 
-            return [ x.Symbol for x in filtered[:50]]
+            return [ x.Symbol for x in filtered[:self.universe_size]]
         else:
             return self.universe
 
@@ -66,73 +80,75 @@ class EnhancedShortTermMeanReversionAlgorithm(QCAlgorithm):
     def OnData(self, data):
         pass
     
-    def short(self):
+    def on_spy_daily(self, sender, bar):
+        self.spy_close = bar.Close
+        self.spy_mean.Update(bar.EndTime, bar.Close)
+
+    def rebalance(self):
+        # one stage per day: roll the close matrix, rank, then emit the long and short targets together
         if self.universe is None: return
-        SPY_Velocity = 0
-        self.long_leverage = 0
-        self.short_leverage = 0
-        # request the history of benchmark
-        pri = self.History(["SPY"], 200, Resolution.Daily)
-        pos_one = (pri.loc["SPY"]['close'][-1])
-        pos_six = (pri.loc["SPY"]['close'][-75:].mean())
-        # calculate velocity of the benchmark 
-        velocity_stop = (pos_one - pos_six)/100.0
-        SPY_Velocity = velocity_stop
-        if SPY_Velocity > 0.0:
+        added = self.close_matrix.sync(self.universe)
+        if added:
+            # seed the symbols that joined the universe with the whole window in one request
+            seed = self.History(added, self.close_matrix.window, Resolution.Daily)
+            if not seed.empty:
+                self.close_matrix.update(seed['close'].unstack(level=0))
+        new = set(added)
+        known = [symbol for symbol in self.universe if symbol not in new]
+        if known:
+            latest = self.History(known, 1, Resolution.Daily)
+            if not latest.empty:
+                self.close_matrix.update(latest['close'].unstack(level=0))
+
+        slots, symbols = self.close_matrix.full()
+        if len(symbols) < self.nq:
+            return
+        closes = self.close_matrix.closes[slots]
+        # latest return but skip the most recent price, and the standard deviation of the daily log returns
+        rets = (closes[:, -2] - closes[:, 0]) / closes[:, 0]
+        stdevs = np.log(closes[:, 1:] / closes[:, :-1]).std(axis=1, ddof=1)
+        ret_qt = quantile_labels(rets, self.nq)
+        low_vol = quantile_labels(stdevs, self.nq_vol) < self.nq_vol
+        self.ret_qt = dict(zip(symbols, ret_qt))
+        self.longs = [symbols[i] for i in np.flatnonzero((ret_qt == 1) & low_vol)]
+        self.shorts = [symbols[i] for i in np.flatnonzero((ret_qt == self.nq) & low_vol)]
+        longs, shorts = set(self.longs), set(self.shorts)
+
+        # keep existing positions still in their extreme quantile, close the rest
+        targets = []
+        existing_longs = 0
+        existing_shorts = 0
+        for kvp in self.Portfolio:
+            holding = kvp.Value
+            symbol = kvp.Key
+            if not holding.Invested or symbol.Value == 'SPY' or symbol not in self.ret_qt:
+                continue
+            current_quantile = self.ret_qt[symbol]
+            if holding.Quantity > 0:
+                if (current_quantile == 1) and (symbol not in longs):
+                    existing_longs += 1
+                elif (current_quantile > 1) and (symbol not in shorts):
+                    targets.append(PortfolioTarget(symbol, 0))
+            else:
+                if (current_quantile == self.nq) and (symbol not in shorts):
+                    existing_shorts += 1
+                elif (current_quantile < self.nq) and (symbol not in longs):
+                    targets.append(PortfolioTarget(symbol, 0))
+
+        # velocity of the benchmark against its 75 day mean
+        if self.spy_mean.IsReady and self.spy_close > self.spy_mean.Current.Value:
             self.long_leverage = 1.8
             self.short_leverage = -0.0
         else:
             self.long_leverage = 1.1
             self.short_leverage = -0.7
+
         for symbol in self.shorts:
-            if len(self.shorts) + self.existing_shorts == 0: return
-            self.AddEquity(symbol, Resolution.Minute)
-            self.SetHoldings(symbol, self.short_leverage/(len(self.shorts) + self.existing_shorts))                                
- 
-    def long(self):
-        if self.universe is None: return
+            self.AddEquity(symbol.Value, Resolution.Minute)
+            targets.append(PortfolioTarget(symbol, self.short_leverage / (len(self.shorts) + existing_shorts)))
         for symbol in self.longs:
-            if len(self.longs) + self.existing_longs == 0: return
-            self.AddEquity(symbol, Resolution.Minute)
-            self.SetHoldings(symbol, self.long_leverage/(len(self.longs) + self.existing_longs))                                
-       
-    def get_prices(self):
-        if self.universe is None: return
-        # Get the last 6 days of prices for every stock in our universe
-        prices = {}
-        hist = self.History(self.universe, 6, Resolution.Daily)
-        for i in self.universe:
-            if str(i) in hist.index.levels[0]:
-                prices[i.Value] = hist.loc[str(i)]['close']
-        df_prices = pd.DataFrame(prices, columns = prices.keys()) 
-        # calculate the daily log return
-        daily_rets = np.log(df_prices/df_prices.shift(1))
-        # calculate the latest return but skip the most recent price
-        rets = (df_prices.iloc[-2] - df_prices.iloc[0]) / df_prices.iloc[0]
-        # standard deviation of the daily return
-        stdevs = daily_rets.std(axis = 0)
-        self.ret_qt = pd.qcut(rets, 5, labels=False) + 1
-        self.stdev_qt = pd.qcut(stdevs, 3, labels=False) + 1
-        self.longs = list((self.ret_qt[self.ret_qt == 1].index) & (self.stdev_qt[self.stdev_qt < 3].index))
-        self.shorts = list((self.ret_qt[self.ret_qt == self.nq].index) & (self.stdev_qt[self.stdev_qt < 3].index))
+            self.AddEquity(symbol.Value, Resolution.Minute)
+            targets.append(PortfolioTarget(symbol, self.long_leverage / (len(self.longs) + existing_longs)))
 
- 
-    def daily_rebalance(self):
-        # rebalance the position in portfolio every day           
-        if self.universe is None: return
-        self.existing_longs = 0
-        self.existing_shorts = 0
-       
-        for symbol in self.Portfolio.Keys:
-            if (symbol.Value != 'SPY') and (symbol.Value in self.ret_qt.index):
-                current_quantile = self.ret_qt.loc[symbol.Value]
-                if self.Portfolio[symbol].Quantity > 0:
-                    if (current_quantile == 1) and (symbol not in self.longs):
-                        self.existing_longs += 1
-                    elif  (current_quantile > 1) and (symbol not in self.shorts): 
-                        self.SetHoldings(symbol, 0)
-                elif self.Portfolio[symbol].Quantity < 0:
-                    if (current_quantile == self.nq) and (symbol not in self.shorts):
-                        self.existing_shorts += 1
-                    elif (current_quantile < self.nq) and (symbol not in self.longs): 
-                        self.SetHoldings(symbol, 0)
+        if targets:
+            self.SetHoldings(targets)
@@ -0,0 +1,84 @@
+from AlgorithmImports import *
+import numpy as np
+
+class CloseMatrix:
+    '''Rolling matrix of the last `window` daily closes of every universe symbol, oldest first.
+
+    New symbols are seeded from one batched History request; after that every day appends a
+    single row per symbol, taken from a one-bar batched History request, so the daily cost does
+    not depend on the length of the window.'''
+
+    def __init__(self, window=6, capacity=64):
+        self.window = window
+        self.closes = np.full((capacity, window), np.nan)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.last_day = np.zeros(capacity, dtype=np.int64)  # ordinal of the latest close
+        self.symbols = [None] * capacity
+        self.slots = {}  # {symbol: slot}
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def sync(self, symbols):
+        '''Adds the new symbols and drops the ones that left; returns the added symbols.'''
+        keep = set(symbols)
+        for symbol in [symbol for symbol in self.slots if symbol not in keep]:
+            slot = self.slots.pop(symbol)
+            self.symbols[slot] = None
+            self.count[slot] = 0
+            self.free_slots.append(slot)
+        added = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.slots]
+        for symbol in added:
+            if not self.free_slots:
+                self._grow()
+            slot = self.free_slots.pop()
+            self.slots[symbol] = slot
+            self.symbols[slot] = symbol
+            self.closes[slot] = np.nan
+            self.count[slot] = 0
+            self.last_day[slot] = 0
+        return added
+
+    def update(self, closes):
+        '''Folds in a (time x symbol) close frame, appending the closes newer than each symbol's latest.'''
+        for time, row in closes.iterrows():
+            row = row.dropna()
+            known = [(self.slots[symbol], close) for symbol, close in row.items() if symbol in self.slots]
+            if not known:
+                continue
+            slots = np.array([slot for slot, _ in known], dtype=np.int64)
+            values = np.array([close for _, close in known])
+            day = time.toordinal()
+            fresh = self.last_day[slots] < day
+            slots, values = slots[fresh], values[fresh]
+            self.closes[slots, :-1] = self.closes[slots, 1:]
+            self.closes[slots, -1] = values
+            self.count[slots] += 1
+            self.last_day[slots] = day
+
+    def full(self):
+        '''Slots and symbols with a complete window.'''
+        slots = np.flatnonzero(self.count >= self.window)
+        return slots, [self.symbols[slot] for slot in slots]
+
+    def _grow(self):
+        capacity = len(self.symbols)
+        self.closes = np.concatenate([self.closes, np.full((capacity, self.window), np.nan)])
+        self.count = np.concatenate([self.count, np.zeros(capacity, dtype=np.int64)])
+        self.last_day = np.concatenate([self.last_day, np.zeros(capacity, dtype=np.int64)])
+        self.symbols.extend([None] * capacity)
+        self.free_slots.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+def quantile_edges(values, quantiles):
+    '''Bin edges of pd.qcut(values, quantiles), from order statistics found with np.partition.'''
+    positions = np.linspace(0, 1, quantiles + 1) * (len(values) - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    ordered = np.partition(values, np.unique(np.concatenate([lower, upper])))
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (positions - lower)
+
+def quantile_labels(values, quantiles):
+    '''1-based labels of pd.qcut(values, quantiles, labels=False) + 1, bins closed on the right.'''
+    edges = quantile_edges(values, quantiles)
+    return np.clip(np.searchsorted(edges, values, side="left"), 1, quantiles)
@@ -0,0 +1,124 @@
+# region imports
+from AlgorithmImports import *
+# endregion
+from time import perf_counter
+import numpy as np
+
+class GapScanner:
+    '''Opening gap scanner over a rolling cache of daily bars.
+
+    Every symbol owns a slot holding the open of its latest daily bar and its last `window` daily
+    closes and volumes, oldest first. Daily bars come in batches from the consolidators, or from a
+    single History request for symbols entering the universe, so nothing is requested at the open.
+    scan() computes the gap of the latest bar over the close before it, and the latest volume over
+    the mean of the earlier ones, for all slots in one vectorized step.'''
+
+    def __init__(self, window=6, capacity=1024):
+        self.window = window
+        self.open = np.full(capacity, np.nan)
+        self.closes = np.full((capacity, window), np.nan)
+        self.volumes = np.zeros((capacity, window))
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.symbols = [None] * capacity
+        self.slots = {}  # {symbol: slot}
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+        self.scans = 0
+        self.seconds = 0.0
+        self.last_scan_ms = 0.0
+
+    def __contains__(self, symbol):
+        return symbol in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, symbol):
+        if symbol in self.slots:
+            return self.slots[symbol]
+        if not self.free_slots:
+            self._grow()
+        slot = self.free_slots.pop()
+        self.slots[symbol] = slot
+        self.symbols[slot] = symbol
+        self._reset(slot)
+        self.active[slot] = True
+        return slot
+
+    def remove(self, symbol):
+        slot = self.slots.pop(symbol, None)
+        if slot is None:
+            return
+        self.symbols[slot] = None
+        self._reset(slot)
+        self.free_slots.append(slot)
+
+    def update(self, symbols, opens, closes, volumes):
+        '''Appends one daily bar per symbol; symbols without a slot are ignored.'''
+        slots = self.slots
+        known = [i for i, symbol in enumerate(symbols) if symbol in slots]
+        if not known:
+            return
+        rows = np.array([slots[symbols[i]] for i in known], dtype=np.int64)
+        # Shift the windows left and write the new bar into the last column
+        self.closes[rows, :-1] = self.closes[rows, 1:]
+        self.volumes[rows, :-1] = self.volumes[rows, 1:]
+        self.closes[rows, -1] = np.asarray(closes)[known]
+        self.volumes[rows, -1] = np.asarray(volumes)[known]
+        self.open[rows] = np.asarray(opens)[known]
+        self.count[rows] += 1
+
+    def seed(self, symbol, opens, closes, volumes):
+        '''Fills a symbol's window from its daily history, oldest bar first.'''
+        slot = self.slots.get(symbol)
+        if slot is None or not len(closes):
+            return
+        closes = np.asarray(closes, dtype=float)[-self.window:]
+        volumes = np.asarray(volumes, dtype=float)[-self.window:]
+        self.closes[slot] = np.nan
+        self.volumes[slot] = 0
+        self.closes[slot, -len(closes):] = closes
+        self.volumes[slot, -len(volumes):] = volumes
+        self.open[slot] = opens[-1]
+        self.count[slot] = len(closes)
+
+    def scan(self, gap_threshold, volume_surge_threshold):
+        '''Ranked candidates as (symbols, gap, volume surge, open), largest gap first, plus the number that gapped.'''
+        start = perf_counter()
+        ready = np.flatnonzero(self.active & (self.count >= 2))
+        previous_close = self.closes[ready, -2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gap = (self.open[ready] - previous_close) / previous_close
+            # Mean over the earlier volumes actually filled
+            earlier = np.minimum(self.count[ready], self.window) - 1
+            average_volume = self.volumes[ready, :-1].sum(axis=1) / earlier
+            surge = self.volumes[ready, -1] / average_volume
+        gapped = gap >= gap_threshold
+        qualified = np.flatnonzero(gapped & (self.volumes[ready, -1] > volume_surge_threshold * average_volume))
+        qualified = qualified[np.argsort(-gap[qualified], kind="stable")]
+
+        slots = ready[qualified]
+        candidates = ([self.symbols[slot] for slot in slots], gap[qualified], surge[qualified], self.open[slots])
+        elapsed = perf_counter() - start
+        self.scans += 1
+        self.seconds += elapsed
+        self.last_scan_ms = elapsed * 1000
+        return candidates, int(gapped.sum())
+
+    def _reset(self, slot):
+        self.open[slot] = np.nan
+        self.closes[slot] = np.nan
+        self.volumes[slot] = 0
+        self.count[slot] = 0
+        self.active[slot] = False
+
+    def _grow(self):
+        capacity = len(self.symbols)
+        self.open = np.concatenate([self.open, np.full(capacity, np.nan)])
+        self.closes = np.concatenate([self.closes, np.full((capacity, self.window), np.nan)])
+        self.volumes = np.concatenate([self.volumes, np.zeros((capacity, self.window))])
+        self.count = np.concatenate([self.count, np.zeros(capacity, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.zeros(capacity, dtype=bool)])
+        self.symbols.extend([None] * capacity)
+        self.free_slots.extend(range(2 * capacity - 1, capacity - 1, -1))
@@ -1,4 +1,10 @@
 from AlgorithmImports import *
+from talib.screening import FundamentalScreen
+from talib.consolidation import ConsolidationPool
+from talib.gap_statistics import GapStatistics
+from talib.brackets import BracketManager
+from talib.journal import TradeJournal
+from gap_scanner import GapScanner
 
 class OvernightGapUpShort(QCAlgorithm):
     def Initialize(self):
@@ -10,6 +16,12 @@ class OvernightGapUpShort(QCAlgorithm):
         self.gap_threshold = float(self.GetParameter("gapThreshold") or 0.03)
         self.log_level = int(self.GetParameter("logLevel") or 1)
         self.volume_surge_threshold = float(self.GetParameter("volumeSurgeThreshold") or 1.5)
+        # when set, entries need a gap z-score above this instead of a gap above gapThreshold
+        gap_z_threshold = self.GetParameter("gapZThreshold")
+        self.gap_z_threshold = float(gap_z_threshold) if gap_z_threshold else None
+
+        cap_thresholds = {"micro": (0, 3e8), "small": (3e8, 2e9), "mid": (2e9, 1e10), "large": (1e10, float("inf"))}
+        self.fundamental_screen = FundamentalScreen.from_tiers(self.cap_tiers, cap_thresholds)
 
         self.position_size = 0.1
         self.daily_pnl = 0
@@ -21,7 +33,17 @@ class OvernightGapUpShort(QCAlgorithm):
         self.AddUniverse(self.CoarseSelectionFunction)
 
         self.active_symbols = set()
-        self.stop_orders = {}
+        self.brackets = BracketManager(self)
+        # one row per closed trade, spilled to compressed chunks under the object store
+        self.journal = TradeJournal(self, self.ObjectStore.GetFilePath("trade_journal"))
+
+        # last daily bars of every universe symbol, built from the hourly data
+        self.gap_scanner = GapScanner()
+        self.daily_bars = ConsolidationPool(self, timedelta(days=1))
+        # per-symbol gap mean/std and ATR, carried over between runs
+        self.gap_stats = GapStatistics(self.ObjectStore.GetFilePath("gap_statistics.npz"))
+        if self.gap_stats.load():
+            self.log(1, f"Loaded gap statistics for {len(self.gap_stats.stored)} symbols")
 
         self.Schedule.On(self.DateRules.EveryDay(), self.TimeRules.AfterMarketOpen(self.spy, 1), self.CheckOvernightGaps)
         self.Schedule.On(self.DateRules.EveryDay(), self.TimeRules.BeforeMarketClose(self.spy, 1), self.ExitPositions)
@@ -32,21 +54,7 @@ class OvernightGapUpShort(QCAlgorithm):
     def FineSelectionFunction(self, fine):
         fine = list(fine)
 
-        caps = []
-        for tier in self.cap_tiers:
-            if tier == "micro":
-                caps.append((0, 3e8))
-            elif tier == "small":
-                caps.append((3e8, 2e9))
-            elif tier == "mid":
-                caps.append((2e9, 1e10))
-            elif tier == "large":
-                caps.append((1e10, float("inf")))
-
-        def match_cap(x):
-            return any(min_cap <= x.MarketCap <= max_cap for min_cap, max_cap in caps)
-
-        filtered = [x.Symbol for x in fine if match_cap(x) and x.DollarVolume > 1e5 and x.Price > 2][:500]
+        filtered = [x.Symbol for x in self.fundamental_screen.filter(fine) if x.DollarVolume > 1e5 and x.Price > 2][:500]
         self.log(2, f"{self.Time.date()} Selected {len(fine)} fine symbols, {len(filtered)} match capTiers={','.join(self.cap_tiers)}")
         return filtered
 
@@ -54,42 +62,63 @@ class OvernightGapUpShort(QCAlgorithm):
         if self.log_level >= level:
             self.Debug(message)
 
+    def OnSecuritiesChanged(self, changes):
+        for security in changes.RemovedSecurities:
+            self.daily_bars.remove(security.Symbol)
+            self.gap_scanner.remove(security.Symbol)
+            self.gap_stats.remove(security.Symbol)
+
+        added = [security.Symbol for security in changes.AddedSecurities]
+        if not added:
+            return
+        for symbol in added:
+            self.gap_scanner.add(symbol)
+            self.gap_stats.add(symbol)
+            self.daily_bars.add(symbol)
+
+        # seed the new symbols' windows with one request, the consolidators take over from here
+        history = self.History(added, max(self.gap_scanner.window, self.gap_stats.window + 1), Resolution.Daily)
+        if history.empty or "volume" not in history.columns:
+            self.log(2, f"{self.Time.date()} No daily history for {len(added)} added symbols")
+            return
+        for symbol, bars in history.groupby(level=0):
+            self.gap_scanner.seed(symbol, bars["open"].to_numpy(), bars["close"].to_numpy(), bars["volume"].to_numpy())
+            self.gap_stats.seed(symbol, bars.index.get_level_values(1), bars["open"].to_numpy(), bars["high"].to_numpy(),
+                                bars["low"].to_numpy(), bars["close"].to_numpy())
+
     def CheckOvernightGaps(self):
         self.active_symbols.clear()
-        qualified_count = 0
 
-        for symbol in self.ActiveSecurities.Keys:
-            history = self.History(symbol, 6, Resolution.Daily)
-            if history.empty or "volume" not in history.columns:
-                self.log(2, f"{symbol}: history missing or no volume")
-                continue
-            if history.empty or len(history.index.unique()) < 2:
-                self.log(2, f"{symbol}: insufficient history")
+        bars = self.daily_bars.drain()
+        if bars is not None:
+            symbols, opens, highs, lows, closes, volumes = bars
+            self.gap_scanner.update(symbols, opens, closes, volumes)
+            self.gap_stats.update(self.Time.date(), symbols, opens, highs, lows, closes)
+
+        # in z-score mode every gap up with a volume surge is a candidate, ranked by its z-score below
+        gap_threshold = self.gap_threshold if self.gap_z_threshold is None else 0.0
+        (symbols, gaps, surges, opens), gapped_count = self.gap_scanner.scan(gap_threshold, self.volume_surge_threshold)
+        self.log(2, f"{self.Time.date()} Scanned {len(self.gap_scanner)} symbols in {self.gap_scanner.last_scan_ms:.2f} ms, "
+                    f"{gapped_count} gapped, {gapped_count - len(symbols)} without volume surge")
+
+        slots = self.gap_stats.slot_array(symbols)
+        zscores, atr_gaps = self.gap_stats.zscore[slots], self.gap_stats.atr_gap[slots]
+        if self.gap_z_threshold is not None:
+            qualified = np.flatnonzero(self.gap_stats.is_ready(slots) & (zscores >= self.gap_z_threshold))
+            qualified = qualified[np.argsort(-zscores[qualified], kind="stable")]
+            symbols = [symbols[i] for i in qualified]
+            gaps, surges, opens, zscores, atr_gaps = gaps[qualified], surges[qualified], opens[qualified], zscores[qualified], atr_gaps[qualified]
+
+        for symbol, gap, surge, today_open, zscore, atr_gap in zip(symbols, gaps, surges, opens, zscores, atr_gaps):
+            qty = self.CalculateOrderQuantity(symbol, -self.position_size)
+            stop_price = self.Securities[symbol].Price * 1.01
+            if self.brackets.open(symbol, qty, stop_price=stop_price, tag=f"gap {gap:.1%} z {zscore:.1f} vol {surge:.1f}x") is None:
                 continue
+            self.log(1, f"Stop loss set at {stop_price:.2f} for {symbol}")
+            self.active_symbols.add(symbol)
+            self.log(1, f"{self.Time} SHORT {symbol} @ {today_open:.2f}, Gap: {gap:.2%} (z {zscore:.2f}, {atr_gap:.2f} ATR), Volume surge: {surge:.1f}x")
 
-            prev_close = history.iloc[-2]["close"]
-            today_open = history.iloc[-1]["open"]
-            avg_volume = history.iloc[:-1]["volume"].mean()
-            today_volume = history.iloc[-1]["volume"]
-            gap = (today_open - prev_close) / prev_close
-
-            if gap >= self.gap_threshold:
-                if today_volume <= self.volume_surge_threshold * avg_volume:
-                    self.log(2, f"{symbol}: volume surge {today_volume:.0f} vs avg {avg_volume:.0f} below threshold")
-                    continue
-                qty = self.CalculateOrderQuantity(symbol, -self.position_size)
-                ticket = self.MarketOrder(symbol, qty)
-                stop_price = self.Securities[symbol].Price * 1.01
-                stop = self.StopMarketOrder(symbol, -qty, stop_price)
-                self.stop_orders[symbol] = stop
-                self.log(1, f"Stop loss set at {stop_price:.2f} for {symbol}")
-                self.active_symbols.add(symbol)
-                qualified_count += 1
-                self.log(1, f"{self.Time} SHORT {symbol} @ {today_open:.2f}, Gap: {gap:.2%}")
-            else:
-                self.log(2, f"{symbol}: gap {gap:.2%} below threshold")
-
-        self.log(1, f"{self.Time.date()} Qualified gap-up symbols: {qualified_count}")
+        self.log(1, f"{self.Time.date()} Qualified gap-up symbols: {len(symbols)}")
 
     def ExitPositions(self):
         self.daily_pnl = 0
@@ -106,12 +135,20 @@ class OvernightGapUpShort(QCAlgorithm):
                 self.total_pnl += pnl
 
                 self.log(1, f"{self.Time} EXIT {symbol} @ {exit_price:.2f}, Entry={entry_price:.2f}, Qty={quantity}, PnL={pnl:.2f}")
-                self.Liquidate(symbol)
-                if symbol in self.stop_orders:
-                    self.Transactions.CancelOrder(self.stop_orders[symbol].OrderId)
-                    self.stop_orders.pop(symbol)
+                # cancels the resting stop along with the exit
+                if not self.brackets.close(symbol):
+                    self.Liquidate(symbol)
 
         self.log(1, f"{self.Time.date()} Total daily PnL: {self.daily_pnl:.2f}")
 
+    def OnOrderEvent(self, order_event):
+        self.brackets.on_order_event(order_event)
+        self.journal.on_order_event(order_event)
+
     def OnEndOfAlgorithm(self):
         self.log(1, f"FINAL SUMMARY: Trades={self.total_trades}, Total PnL={self.total_pnl:.2f}")
+        self.gap_stats.save()
+        self.journal.close()
+        self.log(1, f"Trade journal: {self.journal.trades} trades from {self.journal.fills} fills in {self.journal.chunks} chunks")
+        if self.gap_scanner.scans:
+            self.log(1, f"Gap scans: {self.gap_scanner.scans}, average {self.gap_scanner.seconds / self.gap_scanner.scans * 1000:.2f} ms")
@@ -0,0 +1,128 @@
+# region imports
+from AlgorithmImports import *
+# endregion
+import numpy as np
+
+class FirstHourBook:
+    '''Streaming first-hour consolidation for the intraday mode.
+
+    Minute bars of every symbol are folded into slot-indexed arrays: the session open, the volume
+    traded in the first hour and the latest close. The first bar of a new session rolls all symbols
+    over in one vectorized step: the last close becomes the previous close and the first-hour volume
+    goes into a bounded per-symbol volume history. Nothing is ever requested through History.'''
+
+    def __init__(self, volume_window, market_open=time(9, 30), first_hour=timedelta(hours=1), capacity=256):
+        self.volume_window = volume_window
+        self.market_open = market_open
+        self.first_hour = first_hour
+
+        self.open = np.full(capacity, np.nan)
+        self.first_hour_volume = np.zeros(capacity)
+        self.last_close = np.full(capacity, np.nan)
+        self.previous_close = np.full(capacity, np.nan)
+        self.volumes = np.zeros((capacity, volume_window))  # per-slot ring of first-hour volumes
+        self.volume_count = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.symbols = [None] * capacity
+        self.slots = {}  # {symbol: slot}
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+        self.session = None  # date of the session being consolidated
+        self.first_hour_end = None
+        self.rollovers = 0
+
+    def __contains__(self, symbol):
+        return symbol in self.slots
+
+    def add(self, symbol):
+        if symbol in self.slots:
+            return self.slots[symbol]
+        if not self.free_slots:
+            self._grow()
+        slot = self.free_slots.pop()
+        self.slots[symbol] = slot
+        self.symbols[slot] = symbol
+        self._reset(slot)
+        self.active[slot] = True
+        return slot
+
+    def remove(self, symbol):
+        slot = self.slots.pop(symbol, None)
+        if slot is None:
+            return
+        self.symbols[slot] = None
+        self._reset(slot)
+        self.free_slots.append(slot)
+
+    def update(self, now, bars):
+        '''Folds the minute bars of one slice in; returns the slots that printed.'''
+        if self.session != now.date():
+            self.roll_over(now.date())
+
+        slots, opens, closes, volumes = [], [], [], []
+        for symbol, bar in bars.items():
+            slot = self.slots.get(symbol)
+            if slot is None:
+                continue
+            slots.append(slot)
+            opens.append(bar.Open)
+            closes.append(bar.Close)
+            volumes.append(bar.Volume)
+        slots = np.array(slots, dtype=np.int64)
+        if not len(slots):
+            return slots
+
+        opening = np.isnan(self.open[slots])
+        self.open[slots[opening]] = np.array(opens)[opening]
+        if now <= self.first_hour_end:
+            self.first_hour_volume[slots] += volumes
+        self.last_close[slots] = closes
+        return slots
+
+    def roll_over(self, session):
+        '''Closes the previous session for every symbol at once.'''
+        if self.session is not None:
+            traded = np.flatnonzero(self.active & (self.first_hour_volume > 0))
+            position = self.volume_count[traded] % self.volume_window
+            self.volumes[traded, position] = self.first_hour_volume[traded]
+            self.volume_count[traded] += 1
+            printed = ~np.isnan(self.last_close)
+            self.previous_close[printed] = self.last_close[printed]
+            self.rollovers += 1
+
+        self.open[:] = np.nan
+        self.first_hour_volume[:] = 0
+        self.last_close[:] = np.nan
+        self.session = session
+        self.first_hour_end = datetime.combine(session, self.market_open) + self.first_hour
+
+    def first_hour_complete(self, now):
+        return self.first_hour_end is not None and now >= self.first_hour_end
+
+    def ready(self):
+        '''Slots with a session open and a previous close.'''
+        return np.flatnonzero(self.active & ~np.isnan(self.open) & ~np.isnan(self.previous_close))
+
+    def average_volume(self, slots):
+        counts = np.minimum(self.volume_count[slots], self.volume_window)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(counts > 0, self.volumes[slots].sum(axis=1) / counts, np.nan)
+
+    def _reset(self, slot):
+        self.open[slot] = np.nan
+        self.first_hour_volume[slot] = 0
+        self.last_close[slot] = np.nan
+        self.previous_close[slot] = np.nan
+        self.volumes[slot] = 0
+        self.volume_count[slot] = 0
+        self.active[slot] = False
+
+    def _grow(self):
+        capacity = len(self.symbols)
+        for name, fill in (("open", np.nan), ("first_hour_volume", 0.0), ("last_close", np.nan), ("previous_close", np.nan)):
+            setattr(self, name, np.concatenate([getattr(self, name), np.full(capacity, fill)]))
+        self.volumes = np.concatenate([self.volumes, np.zeros((capacity, self.volume_window))])
+        self.volume_count = np.concatenate([self.volume_count, np.zeros(capacity, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.zeros(capacity, dtype=bool)])
+        self.symbols.extend([None] * capacity)
+        self.free_slots.extend(range(2 * capacity - 1, capacity - 1, -1))
@@ -0,0 +1,213 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+import heapq
+import itertools
+
+
+### Bracket (OCO) orders: an entry with a resting stop and target that cancel each other.
+###
+### open() submits the entry; once it fills, the stop and target legs are placed around the fill
+### price (or at fixed prices). on_order_event() finds the bracket of every order id in a dict, so a
+### filled leg cancels its sibling without scanning positions, and a partially filled leg shrinks
+### its sibling to the remaining quantity. Brackets may expire at a fixed time or a holding period
+### after the entry fill; expire() pops them off a heap, so a call with nothing due is O(1).
+### close() cancels the legs and liquidates, for exits decided by the strategy. A position closed
+### outside the manager (Liquidate(), margin call orders) is noticed from its fill, or from a leg
+### canceled while flat: the remaining legs are canceled and the bracket is discarded.
+###
+### from talib.brackets import BracketManager
+### self.brackets = BracketManager(self)
+### self.brackets.open(symbol, quantity, stop_distance=2 * atr, target_distance=atr, max_hold=timedelta(days=5))
+### def OnOrderEvent(self, order_event): self.brackets.on_order_event(order_event)
+### self.brackets.expire(self.Time)
+###
+
+class Bracket:
+    __slots__ = ("symbol", "quantity", "tag", "entry_ticket", "stop_ticket", "target_ticket",
+                 "stop_price", "target_price", "stop_distance", "target_distance",
+                 "expiry", "max_hold", "entry_price", "entry_time", "armed")
+
+    def __init__(self, symbol, quantity, tag, stop_price, target_price, stop_distance, target_distance, expiry, max_hold):
+        self.symbol = symbol
+        self.quantity = quantity
+        self.tag = tag
+        self.entry_ticket = None
+        self.stop_ticket = None
+        self.target_ticket = None
+        self.stop_price = stop_price
+        self.target_price = target_price
+        self.stop_distance = stop_distance
+        self.target_distance = target_distance
+        self.expiry = expiry
+        self.max_hold = max_hold
+        self.entry_price = None
+        self.entry_time = None
+        self.armed = False  # legs placed
+
+class BracketManager:
+    ENTRY, STOP, TARGET = "entry", "stop", "target"
+
+    def __init__(self, algorithm):
+        self.algorithm = algorithm
+        self.brackets = {}  # {symbol: Bracket}
+        self.orders = {}    # {order id: (Bracket, role)}
+        self.expiries = []  # (expiry, sequence, symbol, Bracket)
+        self.counter = itertools.count()
+
+        self.opened = 0
+        self.stopped = 0
+        self.targeted = 0
+        self.expired = 0
+        self.closed = 0
+        self.flattened = 0  # closed outside the manager
+
+    def __len__(self):
+        return len(self.brackets)
+
+    def __contains__(self, symbol):
+        return symbol in self.brackets
+
+    def __getitem__(self, symbol):
+        return self.brackets[symbol]
+
+    def items(self):
+        return self.brackets.items()
+
+    def open(self, symbol, quantity, stop_price=None, target_price=None, stop_distance=None, target_distance=None,
+             expiry=None, max_hold=None, tag=""):
+        '''Submits a market entry of quantity (negative for a short) with its exit legs.
+
+        Legs are placed at stop_price/target_price, or at stop_distance/target_distance from the
+        entry fill price; either leg may be omitted. The bracket is closed at expiry, or max_hold
+        after the entry fill, by the first expire() call past it.'''
+        if symbol in self.brackets or quantity == 0:
+            return None
+        bracket = Bracket(symbol, quantity, tag, stop_price, target_price, stop_distance, target_distance, expiry, max_hold)
+        ticket = self.algorithm.MarketOrder(symbol, quantity, tag=tag)
+        bracket.entry_ticket = ticket
+        self.brackets[symbol] = bracket
+        self.opened += 1
+        self.orders[ticket.OrderId] = (bracket, self.ENTRY)
+        if expiry is not None:
+            heapq.heappush(self.expiries, (expiry, next(self.counter), symbol, bracket))
+        # A synchronous fill or rejection raises its order event before the ticket is registered
+        if ticket.Status == OrderStatus.Filled:
+            self._arm(bracket)
+        elif ticket.Status == OrderStatus.Invalid:
+            self._discard(bracket)
+            return None
+        return bracket
+
+    def on_order_event(self, order_event):
+        item = self.orders.get(order_event.OrderId)
+        status = order_event.Status
+        if item is None:
+            # Another order that flattened an armed bracket's position leaves its legs orphaned
+            if status == OrderStatus.Filled or status == OrderStatus.PartiallyFilled:
+                bracket = self.brackets.get(order_event.Symbol)
+                if bracket is not None and bracket.armed and self._is_flat(bracket):
+                    self._flatten(bracket)
+            return
+        bracket, role = item
+
+        if role == self.ENTRY:
+            if status == OrderStatus.Filled:
+                self._arm(bracket)
+            elif status == OrderStatus.Canceled or status == OrderStatus.Invalid:
+                self._discard(bracket)
+            return
+
+        if status == OrderStatus.Filled:
+            if role == self.STOP:
+                self.stopped += 1
+            else:
+                self.targeted += 1
+            self._cancel_legs(bracket)
+            self._discard(bracket)
+        elif status == OrderStatus.PartiallyFilled:
+            # Keep the sibling to what is left of the position
+            filled = bracket.stop_ticket if role == self.STOP else bracket.target_ticket
+            sibling = bracket.target_ticket if role == self.STOP else bracket.stop_ticket
+            if sibling is not None:
+                sibling.UpdateQuantity(-(bracket.quantity + filled.QuantityFilled))
+        elif status == OrderStatus.Canceled or status == OrderStatus.Invalid:
+            self.orders.pop(order_event.OrderId, None)
+            # A leg canceled from outside the manager while flat: nothing is left to protect
+            if self._is_flat(bracket):
+                self._flatten(bracket)
+
+    def close(self, symbol, tag="Liquidated"):
+        '''Cancels the open legs and liquidates the position; returns whether a bracket was open.'''
+        bracket = self.brackets.get(symbol)
+        if bracket is None:
+            return False
+        self._cancel_legs(bracket)
+        self._discard(bracket)
+        self.algorithm.Liquidate(symbol, tag=tag)
+        self.closed += 1
+        return True
+
+    def expire(self, now):
+        '''Closes the brackets whose expiry is at or before now; returns their symbols.'''
+        expired = []
+        while self.expiries and self.expiries[0][0] <= now:
+            _, _, symbol, bracket = heapq.heappop(self.expiries)
+            # Skip entries of brackets that closed since
+            if self.brackets.get(symbol) is bracket:
+                self.close(symbol, tag="Bracket expired")
+                self.expired += 1
+                expired.append(symbol)
+        return expired
+
+    def _arm(self, bracket):
+        if bracket.armed:
+            return
+        bracket.armed = True
+        ticket = bracket.entry_ticket
+        price = ticket.AverageFillPrice
+        quantity = ticket.QuantityFilled
+        bracket.entry_price = price
+        bracket.entry_time = self.algorithm.Time
+        bracket.quantity = quantity
+        if bracket.max_hold is not None:
+            bracket.expiry = bracket.entry_time + bracket.max_hold
+            heapq.heappush(self.expiries, (bracket.expiry, next(self.counter), bracket.symbol, bracket))
+
+        # Distances are against the position: below the fill for a long, above it for a short
+        side = 1 if quantity > 0 else -1
+        if bracket.stop_price is None and bracket.stop_distance is not None:
+            bracket.stop_price = price - side * bracket.stop_distance
+        if bracket.target_price is None and bracket.target_distance is not None:
+            bracket.target_price = price + side * bracket.target_distance
+
+        algorithm = self.algorithm
+        if bracket.stop_price is not None:
+            bracket.stop_ticket = algorithm.StopMarketOrder(bracket.symbol, -quantity, bracket.stop_price, tag=bracket.tag)
+            self.orders[bracket.stop_ticket.OrderId] = (bracket, self.STOP)
+        if bracket.target_price is not None:
+            bracket.target_ticket = algorithm.LimitOrder(bracket.symbol, -quantity, bracket.target_price, tag=bracket.tag)
+            self.orders[bracket.target_ticket.OrderId] = (bracket, self.TARGET)
+
+    def _is_flat(self, bracket):
+        return self.algorithm.Portfolio[bracket.symbol].Quantity == 0
+
+    def _flatten(self, bracket):
+        self._cancel_legs(bracket)
+        self._discard(bracket)
+        self.flattened += 1
+
+    def _cancel_legs(self, bracket):
+        for ticket in (bracket.stop_ticket, bracket.target_ticket):
+            if ticket is None:
+                continue
+            self.orders.pop(ticket.OrderId, None)
+            if ticket.Status != OrderStatus.Filled and ticket.Status != OrderStatus.Canceled:
+                ticket.Cancel()
+
+    def _discard(self, bracket):
+        for ticket in (bracket.entry_ticket, bracket.stop_ticket, bracket.target_ticket):
+            if ticket is not None:
+                self.orders.pop(ticket.OrderId, None)
+        if self.brackets.get(bracket.symbol) is bracket:
+            del self.brackets[bracket.symbol]
@@ -0,0 +1,135 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+
+
+### Chart decimation for high-frequency Plot calls.
+###
+### ChartDecimator.plot(chart, series, value) has the same shape as QCAlgorithm.Plot but aggregates
+### the values of each series into time buckets and only hands one bucket summary to Plot:
+###   last    - the last value of the bucket
+###   ohlc    - open/high/low/close of the bucket (the series must be a CandlestickSeries)
+###   minmax  - the bucket's min and max, plotted as "<series> Min" and "<series> Max"
+###   lttb    - largest-triangle-three-buckets: the bucket's most significant value, which needs
+###             the following bucket, so lttb points are emitted one bucket late
+### Without an explicit bucket width the backtest span is split into max_points buckets, so long
+### runs emit a bounded number of points per series. Points are stamped when they are emitted,
+### i.e. with bucket resolution. Call flush() in OnEndOfAlgorithm to emit the open buckets.
+###
+### from talib.charting import ChartDecimator
+###
+
+MODES = ("last", "ohlc", "minmax", "lttb")
+
+class _SeriesBucket:
+    __slots__ = ("end", "open", "high", "low", "close", "times", "values",
+                 "pending_times", "pending_values", "previous", "emitted")
+
+    def __init__(self):
+        self.end = None
+        self.pending_times = None
+        self.pending_values = None
+        self.previous = None  # (time, value) of the last point lttb emitted
+        self.emitted = 0
+        self.reset()
+
+    def reset(self):
+        self.open = self.high = self.low = self.close = None
+        self.times = []
+        self.values = []
+
+    def add(self, time, value, keep_points):
+        if self.open is None:
+            self.open = self.high = self.low = value
+        else:
+            self.high = max(self.high, value)
+            self.low = min(self.low, value)
+        self.close = value
+        if keep_points:
+            self.times.append(time)
+            self.values.append(value)
+
+class ChartDecimator:
+    def __init__(self, algorithm, max_points=2000, bucket=None, mode="last"):
+        if mode not in MODES:
+            raise ValueError(f"Unknown chart decimation mode {mode}, expected one of {MODES}")
+        self.algorithm = algorithm
+        self.max_points = max_points
+        self.mode = mode
+        if bucket is None:
+            span = algorithm.EndDate - algorithm.StartDate
+            bucket = max(span / max_points, timedelta(minutes=1))
+        self.bucket = bucket
+        self.buckets = {}  # {(chart, series): _SeriesBucket}
+
+        self.received = 0
+        self.dropped = 0  # buckets over the per-series budget
+
+    def plot(self, chart, series, value):
+        self.received += 1
+        key = (chart, series)
+        state = self.buckets.get(key)
+        if state is None:
+            state = self.buckets[key] = _SeriesBucket()
+
+        now = self.algorithm.Time
+        if state.end is None:
+            state.end = now + self.bucket
+        elif now >= state.end:
+            self._emit(chart, series, state)
+            state.reset()
+            while state.end <= now:
+                state.end += self.bucket
+
+        state.add(now.timestamp(), float(value), self.mode == "lttb")
+
+    def flush(self):
+        for (chart, series), state in self.buckets.items():
+            if state.open is not None:
+                self._emit(chart, series, state)
+                state.reset()
+            if self.mode == "lttb" and state.pending_values:
+                # Nothing follows the final bucket: keep its last point
+                self._plot(chart, series, state.pending_values[-1])
+                state.pending_times = state.pending_values = None
+
+    def _emit(self, chart, series, state):
+        if state.emitted >= self.max_points:
+            self.dropped += 1
+            return
+        state.emitted += 1
+
+        if self.mode == "last":
+            self._plot(chart, series, state.close)
+        elif self.mode == "ohlc":
+            self._plot(chart, series, state.open, state.high, state.low, state.close)
+        elif self.mode == "minmax":
+            self._plot(chart, f"{series} Min", state.low)
+            self._plot(chart, f"{series} Max", state.high)
+        else:
+            self._emit_lttb(chart, series, state)
+
+    def _emit_lttb(self, chart, series, state):
+        if state.pending_values is None:
+            # First bucket: its first point anchors the triangles
+            state.previous = (state.times[0], state.values[0])
+            self._plot(chart, series, state.values[0])
+        else:
+            # Pick the pending point forming the largest triangle with the previous selection
+            # and the average of the bucket that just closed
+            average_time = sum(state.times) / len(state.times)
+            average_value = sum(state.values) / len(state.values)
+            previous_time, previous_value = state.previous
+            best, best_area = 0, -1.0
+            for i, (time, value) in enumerate(zip(state.pending_times, state.pending_values)):
+                area = abs((previous_time - average_time) * (value - previous_value)
+                           - (previous_time - time) * (average_value - previous_value))
+                if area > best_area:
+                    best, best_area = i, area
+            state.previous = (state.pending_times[best], state.pending_values[best])
+            self._plot(chart, series, state.pending_values[best])
+        state.pending_times = state.times
+        state.pending_values = state.values
+
+    def _plot(self, chart, series, *values):
+        self.algorithm.Plot(chart, series, *values)
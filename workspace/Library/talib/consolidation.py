@@ -0,0 +1,77 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+import numpy as np
+
+
+### Shared bar consolidation for a minute-resolution universe.
+###
+### Every symbol gets one engine TradeBarConsolidator for the configured period, so minute bars are
+### aggregated inside the engine and Python never sees them. All consolidators share a single
+### handler that only appends the finished bar; drain() hands the bars that closed since the last
+### call to the algorithm as arrays, so the whole universe is processed in one batch per period
+### instead of one Python callback of strategy logic per symbol.
+###
+### from talib.consolidation import ConsolidationPool
+### pool = ConsolidationPool(self, timedelta(minutes=30))
+### pool.add(symbol); symbols, opens, highs, lows, closes, volumes = pool.drain()
+###
+
+class ConsolidationPool:
+    def __init__(self, algorithm, period):
+        self.algorithm = algorithm
+        self.period = period
+        self.consolidators = {}  # {symbol: TradeBarConsolidator}
+        self.pending = []
+        # Keep one bound handler so it can be detached again
+        self.handler = self.on_consolidated
+
+        self.consolidated = 0
+        self.batches = 0
+
+    def __contains__(self, symbol):
+        return symbol in self.consolidators
+
+    def __len__(self):
+        return len(self.consolidators)
+
+    def add(self, symbol):
+        if symbol in self.consolidators:
+            return
+        consolidator = TradeBarConsolidator(self.period)
+        consolidator.DataConsolidated += self.handler
+        self.algorithm.SubscriptionManager.AddConsolidator(symbol, consolidator)
+        self.consolidators[symbol] = consolidator
+
+    def remove(self, symbol):
+        consolidator = self.consolidators.pop(symbol, None)
+        if consolidator is None:
+            return
+        consolidator.DataConsolidated -= self.handler
+        self.algorithm.SubscriptionManager.RemoveConsolidator(symbol, consolidator)
+
+    def on_consolidated(self, sender, bar):
+        self.pending.append(bar)
+
+    def drain(self):
+        '''Bars consolidated since the last call as (symbols, open, high, low, close, volume), None if there are none.
+        A symbol closing more than one bar in between keeps only its latest bar.'''
+        if not self.pending:
+            return None
+        latest = {}
+        for bar in self.pending:
+            latest[bar.Symbol] = bar
+        self.pending = []
+        self.batches += 1
+        self.consolidated += len(latest)
+
+        bars = list(latest.values())
+        count = len(bars)
+        opens, highs, lows, closes, volumes = (np.empty(count) for _ in range(5))
+        for i, bar in enumerate(bars):
+            opens[i] = bar.Open
+            highs[i] = bar.High
+            lows[i] = bar.Low
+            closes[i] = bar.Close
+            volumes[i] = bar.Volume
+        return [bar.Symbol for bar in bars], opens, highs, lows, closes, volumes
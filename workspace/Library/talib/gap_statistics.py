@@ -0,0 +1,223 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+import os
+import numpy as np
+
+
+### Per-symbol overnight gap statistics, updated incrementally and persisted between runs.
+###
+### Every symbol owns a slot in flat arrays holding the running mean and M2 of its overnight gaps
+### (open over previous close) and a Wilders ATR of its daily true range. Each daily bar is scored
+### against the statistics as they stood before it, the z-score of its gap and the gap in ATRs,
+### and is then folded in with Welford's update. The count used in the update is capped at
+### window, so after window days the statistics weigh recent gaps exponentially instead of
+### freezing on a long history. save() writes the state keyed by security identifier to a .npz,
+### and load() restores it, so symbols seen in an earlier run need no warm-up.
+###
+### from talib.gap_statistics import GapStatistics
+### stats = GapStatistics(self.ObjectStore.GetFilePath("gap_statistics.npz")); stats.load()
+### stats.add(symbol); stats.update(day, symbols, opens, highs, lows, closes)
+### z = stats.zscore[stats.slot_array(symbols)]
+###
+
+class GapStatistics:
+    def __init__(self, path=None, window=60, atr_period=14, min_count=20, stale_days=7, capacity=1024):
+        self.path = path
+        self.window = window
+        self.atr_period = atr_period
+        self.min_count = min_count
+        self.stale_days = stale_days
+
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.mean = np.zeros(capacity)
+        self.m2 = np.zeros(capacity)
+        self.atr = np.full(capacity, np.nan)
+        self.atr_count = np.zeros(capacity, dtype=np.int64)
+        self.previous_close = np.full(capacity, np.nan)
+        self.last_day = np.zeros(capacity, dtype=np.int64)  # ordinal of the last bar folded in
+        # Scores of the latest bar, against the statistics before it
+        self.gap = np.full(capacity, np.nan)
+        self.zscore = np.full(capacity, np.nan)
+        self.atr_gap = np.full(capacity, np.nan)
+
+        self.symbols = [None] * capacity
+        self.slots = {}  # {symbol: slot}
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.stored = {}  # {security identifier: row of the loaded state}
+        self.restored = 0
+
+    def __contains__(self, symbol):
+        return symbol in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def std(self, slots):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.sqrt(self.m2[slots] / (np.minimum(self.count[slots], self.window) - 1))
+
+    def add(self, symbol):
+        if symbol in self.slots:
+            return self.slots[symbol]
+        if not self.free_slots:
+            self._grow()
+        slot = self.free_slots.pop()
+        self.slots[symbol] = slot
+        self.symbols[slot] = symbol
+        self._reset(slot)
+        state = self.stored.pop(str(symbol.ID), None)
+        if state is not None:
+            self._restore(slot, state)
+            self.restored += 1
+        return slot
+
+    def remove(self, symbol):
+        slot = self.slots.pop(symbol, None)
+        if slot is None:
+            return
+        # Keep the state so it is saved and restored if the symbol comes back
+        self.stored[str(symbol.ID)] = self._state(slot)
+        self.symbols[slot] = None
+        self._reset(slot)
+        self.free_slots.append(slot)
+
+    def slot_array(self, symbols):
+        return np.array([self.slots[symbol] for symbol in symbols], dtype=np.int64)
+
+    def is_ready(self, slots):
+        return self.count[slots] >= self.min_count
+
+    def update(self, day, symbols, opens, highs, lows, closes):
+        '''Scores and folds in one daily bar per symbol; day is the bar's date. Bars already folded in are skipped.'''
+        slots = self.slots
+        known = [i for i, symbol in enumerate(symbols) if symbol in slots]
+        if not known:
+            return
+        rows = np.array([slots[symbols[i]] for i in known], dtype=np.int64)
+        ordinal = day.toordinal()
+        self._check_continuity(rows, ordinal)
+        fresh = self.last_day[rows] < ordinal
+        rows = rows[fresh]
+        known = np.array(known)[fresh]
+        self.update_arrays(rows, np.asarray(opens, dtype=float)[known], np.asarray(highs, dtype=float)[known],
+                           np.asarray(lows, dtype=float)[known], np.asarray(closes, dtype=float)[known])
+        self.last_day[rows] = ordinal
+
+    def seed(self, symbol, days, opens, highs, lows, closes):
+        '''Folds a symbol's daily history in, oldest bar first.'''
+        slot = self.slots.get(symbol)
+        if slot is None:
+            return
+        rows = np.array([slot])
+        days = [day.toordinal() for day in days]
+        if days:
+            self._check_continuity(rows, days[-1])
+            fresh = [ordinal for ordinal in days if ordinal > self.last_day[slot]]
+            if fresh:
+                self._check_continuity(rows, fresh[0])
+        for ordinal, o, h, l, c in zip(days, opens, highs, lows, closes):
+            if ordinal <= self.last_day[slot]:
+                continue
+            self.update_arrays(rows, np.array([o]), np.array([h]), np.array([l]), np.array([c]))
+            self.last_day[slot] = ordinal
+
+    def update_arrays(self, slots, opens, highs, lows, closes):
+        previous_close = self.previous_close[slots]
+        has_previous = ~np.isnan(previous_close)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gap = (opens - previous_close) / previous_close
+            std = self.std(slots)
+            self.gap[slots] = gap
+            self.zscore[slots] = np.where(self.count[slots] >= 2, (gap - self.mean[slots]) / std, np.nan)
+            self.atr_gap[slots] = (opens - previous_close) / self.atr[slots]
+
+        # Welford's update with the count capped at window
+        scored = slots[has_previous & np.isfinite(gap)]
+        gap = gap[has_previous & np.isfinite(gap)]
+        count = self.count[scored] + 1
+        n = np.minimum(count, self.window)
+        delta = gap - self.mean[scored]
+        mean = self.mean[scored] + delta / n
+        self.m2[scored] = self.m2[scored] * np.where(count > self.window, (n - 1) / n, 1.0) + delta * (gap - mean)
+        self.mean[scored] = mean
+        self.count[scored] = count
+
+        # Wilders ATR of the true range, seeded with the running mean
+        true_range = np.where(has_previous,
+                              np.maximum(highs, previous_close) - np.minimum(lows, previous_close),
+                              highs - lows)
+        atr_count = self.atr_count[slots] + 1
+        period = np.minimum(atr_count, self.atr_period)
+        atr = np.where(atr_count == 1, true_range, self.atr[slots] + (true_range - self.atr[slots]) / period)
+        self.atr[slots] = atr
+        self.atr_count[slots] = atr_count
+        self.previous_close[slots] = closes
+
+    def _check_continuity(self, slots, ordinal):
+        '''Drops state newer than the bar of ordinal (a backtest over an earlier period must not see it),
+        and the previous close of state more than stale_days older, which is too old to gap from.'''
+        ahead = slots[self.last_day[slots] > ordinal]
+        for slot in ahead:
+            self._reset(slot)
+        stale = slots[(self.last_day[slots] > 0) & (ordinal - self.last_day[slots] > self.stale_days)]
+        self.previous_close[stale] = np.nan
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as data:
+            ids = data["ids"]
+            columns = [data[name] for name in _STATE]
+        self.stored = {str(sid): tuple(column[i] for column in columns) for i, sid in enumerate(ids)}
+        # Symbols added before load() pick up their state now
+        for symbol, slot in self.slots.items():
+            state = self.stored.pop(str(symbol.ID), None)
+            if state is not None:
+                self._restore(slot, state)
+                self.restored += 1
+        return True
+
+    def save(self):
+        if self.path is None:
+            return
+        states = dict(self.stored)
+        for symbol, slot in self.slots.items():
+            states[str(symbol.ID)] = self._state(slot)
+        ids = list(states)
+        columns = list(zip(*states.values())) if states else [()] * len(_STATE)
+        np.savez_compressed(self.path, ids=np.array(ids, dtype=str),
+                            **{name: np.array(column, dtype=self._dtype(name)) for name, column in zip(_STATE, columns)})
+
+    def _dtype(self, name):
+        return getattr(self, name).dtype
+
+    def _state(self, slot):
+        return tuple(getattr(self, name)[slot] for name in _STATE)
+
+    def _restore(self, slot, state):
+        for name, value in zip(_STATE, state):
+            getattr(self, name)[slot] = value
+
+    def _reset(self, slot):
+        self.count[slot] = 0
+        self.mean[slot] = 0
+        self.m2[slot] = 0
+        self.atr[slot] = np.nan
+        self.atr_count[slot] = 0
+        self.previous_close[slot] = np.nan
+        self.last_day[slot] = 0
+        self.gap[slot] = np.nan
+        self.zscore[slot] = np.nan
+        self.atr_gap[slot] = np.nan
+
+    def _grow(self):
+        capacity = len(self.symbols)
+        for name in ("count", "mean", "m2", "atr", "atr_count", "previous_close", "last_day", "gap", "zscore", "atr_gap"):
+            array = getattr(self, name)
+            fill = np.nan if array.dtype.kind == "f" and name not in ("mean", "m2") else 0
+            setattr(self, name, np.concatenate([array, np.full(capacity, fill, dtype=array.dtype)]))
+        self.symbols.extend([None] * capacity)
+        self.free_slots.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+_STATE = ("count", "mean", "m2", "atr", "atr_count", "previous_close", "last_day")
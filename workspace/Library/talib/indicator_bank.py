@@ -0,0 +1,333 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+import numpy as np
+
+
+### Fused Bollinger Bands / RSI / ATR for a whole universe.
+###
+### One IndicatorBank replaces the BB, RSI and ATR indicators registered per symbol: every bar is
+### ingested once (update(data.Bars)) and the three indicators of all symbols that printed are
+### advanced together over slot-indexed NumPy arrays. Rolling sums make every update O(1) per
+### symbol; they are recomputed from their ring each time it wraps so float error cannot build up.
+###
+### The values follow Lean's definitions:
+###   Bollinger  - simple moving average of closes +/- k population standard deviations,
+###                bandwidth = (upper - lower) / middle
+###   RSI        - simple or Wilder averages of close-to-close gains and losses, ready after
+###                period + 1 bars, 100 while there are no losses
+###   ATR        - simple or Wilder average of the true range, whose first value is 0
+### Wilder averages are the mean of the values seen until period values are in, then Wilder
+### smoothing, which is how Lean's WilderMovingAverage seeds itself. Fill-forward bars are skipped
+### like the engine does. check_against_lean() feeds one fixed series to a bank and to Lean's
+### BollingerBands, RelativeStrengthIndex and AverageTrueRange, with simple and Wilder averages, and
+### raises if any output or readiness differs beyond a tolerance. It is meant for research (a
+### QuantBook), not for an algorithm's Initialize.
+###
+### The bank does not consolidate: feed it bars of the resolution the indicators are meant for.
+###
+### from talib.indicator_bank import IndicatorBank, check_against_lean
+### bank = IndicatorBank(bb_period=30, bb_k=2, rsi_period=14, atr_period=14)
+### bank.add(symbol); bank.update(data.Bars); bank.is_ready(symbol); bank.values(symbol)
+### check_against_lean(bb_period=30, bb_k=2, rsi_period=14, atr_period=14)
+###
+
+AVERAGES = ("simple", "wilders")
+_LEAN_AVERAGES = {"simple": "Simple", "wilders": "Wilders"}
+
+class _RollingAverage:
+    '''Per-slot simple or Wilder average of a stream of values.'''
+
+    def __init__(self, capacity, period, kind):
+        if kind not in AVERAGES:
+            raise ValueError(f"Unknown average type {kind}, expected one of {AVERAGES}")
+        self.period = period
+        self.kind = kind
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.value = np.zeros(capacity)
+        if kind == "simple":
+            self.ring = np.zeros((capacity, period))
+            self.sum = np.zeros(capacity)
+
+    def reset(self, slots):
+        self.count[slots] = 0
+        self.value[slots] = 0.0
+        if self.kind == "simple":
+            self.ring[slots] = 0.0
+            self.sum[slots] = 0.0
+
+    def grow(self, capacity):
+        extra = capacity - len(self.count)
+        self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+        self.value = np.concatenate([self.value, np.zeros(extra)])
+        if self.kind == "simple":
+            self.ring = np.concatenate([self.ring, np.zeros((extra, self.period))])
+            self.sum = np.concatenate([self.sum, np.zeros(extra)])
+
+    def update(self, slots, values):
+        period = self.period
+        count = self.count[slots] + 1
+        self.count[slots] = count
+        if self.kind == "wilders":
+            # Running mean over the first period values, then Wilder smoothing
+            divisor = np.minimum(count, period)
+            self.value[slots] += (values - self.value[slots]) / divisor
+            return
+
+        position = (count - 1) % period
+        self.sum[slots] += values - self.ring[slots, position]
+        self.ring[slots, position] = values
+        wrapped = slots[position == period - 1]
+        if len(wrapped):
+            self.sum[wrapped] = self.ring[wrapped].sum(axis=1)
+        self.value[slots] = self.sum[slots] / np.minimum(count, period)
+
+    def is_ready(self, slots):
+        return self.count[slots] >= self.period
+
+class IndicatorBank:
+    def __init__(self, bb_period=30, bb_k=2.0, rsi_period=14, atr_period=14,
+                 rsi_average="simple", atr_average="simple", capacity=512):
+        self.bb_period = int(bb_period)
+        self.bb_k = float(bb_k)
+        self.rsi_period = int(rsi_period)
+        self.atr_period = int(atr_period)
+
+        # Bollinger: ring of closes and sums of their offsets from a per-slot anchor, which keeps
+        # the sum of squares well conditioned for low-volatility symbols
+        self.closes = np.zeros((capacity, self.bb_period))
+        self.bb_count = np.zeros(capacity, dtype=np.int64)
+        self.bb_anchor = np.zeros(capacity)
+        self.bb_sum = np.zeros(capacity)
+        self.bb_sum_squares = np.zeros(capacity)
+
+        self.previous_close = np.full(capacity, np.nan)
+        self.gains = _RollingAverage(capacity, self.rsi_period, rsi_average)
+        self.losses = _RollingAverage(capacity, self.rsi_period, rsi_average)
+        self.true_ranges = _RollingAverage(capacity, self.atr_period, atr_average)
+
+        # Latest values
+        self.middle = np.full(capacity, np.nan)
+        self.upper = np.full(capacity, np.nan)
+        self.lower = np.full(capacity, np.nan)
+        self.bandwidth = np.full(capacity, np.nan)
+        self.rsi = np.full(capacity, np.nan)
+        self.atr = np.full(capacity, np.nan)
+
+        self.symbols = [None] * capacity
+        self.slots = {}  # {symbol: slot}
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+    def __contains__(self, symbol):
+        return symbol in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, symbol):
+        slot = self.slots.get(symbol)
+        if slot is not None:
+            return slot
+        if not self.free_slots:
+            self._grow()
+        slot = self.free_slots.pop()
+        self.slots[symbol] = slot
+        self.symbols[slot] = symbol
+        self._reset(slot)
+        return slot
+
+    def remove(self, symbol):
+        slot = self.slots.pop(symbol, None)
+        if slot is None:
+            return None
+        self.symbols[slot] = None
+        self._reset(slot)
+        self.free_slots.append(slot)
+        return slot
+
+    def update(self, bars):
+        '''Ingests a Slice.Bars collection once; returns the slots that were updated.'''
+        slots, highs, lows, closes = [], [], [], []
+        for symbol, bar in bars.items():
+            slot = self.slots.get(symbol)
+            if slot is None or bar.IsFillForward:
+                continue
+            slots.append(slot)
+            highs.append(bar.High)
+            lows.append(bar.Low)
+            closes.append(bar.Close)
+        slots = np.array(slots, dtype=np.int64)
+        if len(slots):
+            self.update_arrays(slots, np.array(highs, dtype=float), np.array(lows, dtype=float),
+                               np.array(closes, dtype=float))
+        return slots
+
+    def update_arrays(self, slots, high, low, close):
+        '''Advances all indicators of the given (unique) slots by one bar.'''
+        self._update_bollinger(slots, close)
+
+        previous = self.previous_close[slots]
+        has_previous = ~np.isnan(previous)
+
+        # RSI: gains and losses only exist from the second bar on
+        change = close[has_previous] - previous[has_previous]
+        changed = slots[has_previous]
+        self.gains.update(changed, np.maximum(change, 0.0))
+        self.losses.update(changed, np.maximum(-change, 0.0))
+        average_gain = self.gains.value[slots]
+        average_loss = self.losses.value[slots]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.rsi[slots] = np.where(average_loss == 0, 100.0,
+                                       100.0 - 100.0 / (1.0 + average_gain / average_loss))
+
+        # ATR: the first true range is 0, then the largest of the three ranges
+        true_range = np.where(has_previous,
+                              np.maximum(high - low, np.maximum(np.abs(high - previous), np.abs(low - previous))),
+                              0.0)
+        self.true_ranges.update(slots, true_range)
+        self.atr[slots] = self.true_ranges.value[slots]
+
+        self.previous_close[slots] = close
+
+    def is_ready(self, symbols_or_slots):
+        '''Readiness of every indicator, for a symbol or an array of slots.'''
+        slots = self._slots(symbols_or_slots)
+        ready = (self.bb_count[slots] >= self.bb_period) & self.gains.is_ready(slots) & self.true_ranges.is_ready(slots)
+        return bool(ready) if np.ndim(ready) == 0 else ready
+
+    def values(self, symbol):
+        '''Latest indicator values of a symbol as a dict.'''
+        slot = self.slots[symbol]
+        return {
+            "middle": self.middle[slot], "upper": self.upper[slot], "lower": self.lower[slot],
+            "bandwidth": self.bandwidth[slot], "rsi": self.rsi[slot], "atr": self.atr[slot],
+        }
+
+    def _update_bollinger(self, slots, close):
+        period = self.bb_period
+        count = self.bb_count[slots] + 1
+        self.bb_count[slots] = count
+        first = count == 1
+        self.bb_anchor[slots[first]] = close[first]
+
+        position = (count - 1) % period
+        anchor = self.bb_anchor[slots]
+        offset = close - anchor
+        old = np.where(count > period, self.closes[slots, position] - anchor, 0.0)
+        self.bb_sum[slots] += offset - old
+        self.bb_sum_squares[slots] += offset * offset - old * old
+        self.closes[slots, position] = close
+
+        # Full ring: re-anchor on its mean and recompute the sums from scratch
+        wrapped = slots[position == period - 1]
+        if len(wrapped):
+            window = self.closes[wrapped]
+            self.bb_anchor[wrapped] = window.mean(axis=1)
+            offsets = window - self.bb_anchor[wrapped][:, None]
+            self.bb_sum[wrapped] = offsets.sum(axis=1)
+            self.bb_sum_squares[wrapped] = (offsets * offsets).sum(axis=1)
+
+        samples = np.minimum(count, period)
+        mean_offset = self.bb_sum[slots] / samples
+        variance = np.maximum(self.bb_sum_squares[slots] / samples - mean_offset * mean_offset, 0.0)
+        middle = self.bb_anchor[slots] + mean_offset
+        width = self.bb_k * np.sqrt(variance)
+        self.middle[slots] = middle
+        self.upper[slots] = middle + width
+        self.lower[slots] = middle - width
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.bandwidth[slots] = np.where(middle == 0, 0.0, 2.0 * width / middle)
+
+    def _slots(self, symbols_or_slots):
+        if isinstance(symbols_or_slots, np.ndarray):
+            return symbols_or_slots
+        return self.slots[symbols_or_slots]
+
+    def _reset(self, slot):
+        self.closes[slot] = 0.0
+        self.bb_count[slot] = 0
+        self.bb_anchor[slot] = 0.0
+        self.bb_sum[slot] = 0.0
+        self.bb_sum_squares[slot] = 0.0
+        self.previous_close[slot] = np.nan
+        for average in (self.gains, self.losses, self.true_ranges):
+            average.reset(slot)
+        for values in (self.middle, self.upper, self.lower, self.bandwidth, self.rsi, self.atr):
+            values[slot] = np.nan
+
+    def _grow(self):
+        capacity = len(self.symbols)
+        new_capacity = 2 * capacity
+        self.closes = np.concatenate([self.closes, np.zeros((capacity, self.bb_period))])
+        for name in ("bb_anchor", "bb_sum", "bb_sum_squares"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.zeros(capacity)]))
+        self.bb_count = np.concatenate([self.bb_count, np.zeros(capacity, dtype=np.int64)])
+        for name in ("previous_close", "middle", "upper", "lower", "bandwidth", "rsi", "atr"):
+            setattr(self, name, np.concatenate([getattr(self, name), np.full(capacity, np.nan)]))
+        for average in (self.gains, self.losses, self.true_ranges):
+            average.grow(new_capacity)
+        self.symbols.extend([None] * capacity)
+        self.free_slots.extend(range(new_capacity - 1, capacity - 1, -1))
+
+def parity_series(bars=250, seed=7):
+    '''Fixed OHLC series for check_against_lean(): a random walk with a run of rising closes (no
+    losses for the RSI) and a nearly flat stretch (tiny Bollinger variance).'''
+    rng = np.random.default_rng(seed)
+    closes = 50.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, bars)))
+    rise = slice(bars // 5, bars // 5 + 25)
+    closes[rise] = closes[rise.start - 1] * np.cumprod(np.full(25, 1.003))
+    flat = slice(bars // 2, bars // 2 + 40)
+    closes[flat] = closes[flat.start - 1] + rng.normal(0.0, 1e-4, 40)
+    opens = np.concatenate([[closes[0]], closes[:-1]]) * (1.0 + rng.normal(0.0, 0.004, bars))
+    highs = np.maximum(opens, closes) * (1.0 + rng.uniform(0.0, 0.01, bars))
+    lows = np.minimum(opens, closes) * (1.0 - rng.uniform(0.0, 0.01, bars))
+    return tuple(np.round(values, 4) for values in (opens, highs, lows, closes))
+
+def check_against_lean(bb_period=30, bb_k=2.0, rsi_period=14, atr_period=14, series=None, tolerance=1e-6):
+    '''Compares a bank with Lean's indicators bar by bar, for simple and Wilder averages.
+
+    Returns the largest deviation of every output, relative to max(1, |value|), as
+    {(average, output): deviation}. Raises ValueError when a deviation exceeds tolerance or the
+    two disagree on readiness.'''
+    opens, highs, lows, closes = series if series is not None else parity_series()
+    symbol = Symbol.Create("PARITY", SecurityType.Equity, Market.USA)
+    start = datetime(2000, 1, 3)
+    deviations = {}
+    for average in AVERAGES:
+        lean_average = getattr(MovingAverageType, _LEAN_AVERAGES[average])
+        bank = IndicatorBank(bb_period, bb_k, rsi_period, atr_period, rsi_average=average, atr_average=average, capacity=1)
+        slot = bank.add(symbol)
+        bb = BollingerBands(int(bb_period), float(bb_k), MovingAverageType.Simple)
+        rsi = RelativeStrengthIndex(int(rsi_period), lean_average)
+        atr = AverageTrueRange(int(atr_period), lean_average)
+        worst = dict.fromkeys(("middle", "upper", "lower", "bandwidth", "rsi", "atr"), 0.0)
+        for i in range(len(closes)):
+            time = start + timedelta(days=i)
+            bar = TradeBar(time, symbol, float(opens[i]), float(highs[i]), float(lows[i]), float(closes[i]), 0, timedelta(days=1))
+            bb.Update(bar.EndTime, bar.Close)
+            rsi.Update(bar.EndTime, bar.Close)
+            atr.Update(bar)
+            bank.update_arrays(np.array([slot]), highs[i:i + 1], lows[i:i + 1], closes[i:i + 1])
+
+            lean_ready = bb.IsReady and rsi.IsReady and atr.IsReady
+            if bank.is_ready(symbol) != lean_ready:
+                raise ValueError(f"Indicator bank ({average}) readiness differs from Lean on bar {i}: "
+                                 f"bank {bank.is_ready(symbol)}, Lean {lean_ready}")
+            if not lean_ready:
+                continue
+            expected = {
+                "middle": bb.MiddleBand.Current.Value, "upper": bb.UpperBand.Current.Value,
+                "lower": bb.LowerBand.Current.Value, "bandwidth": bb.BandWidth.Current.Value,
+                "rsi": rsi.Current.Value, "atr": atr.Current.Value,
+            }
+            values = bank.values(symbol)
+            for name, value in expected.items():
+                value = float(value)
+                deviation = abs(values[name] - value) / max(1.0, abs(value))
+                worst[name] = max(worst[name], deviation)
+                if deviation > tolerance:
+                    raise ValueError(f"Indicator bank ({average}) {name} differs from Lean on bar {i}: "
+                                     f"bank {values[name]}, Lean {value}")
+        for name, deviation in worst.items():
+            deviations[(average, name)] = deviation
+    return deviations
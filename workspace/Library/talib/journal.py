@@ -0,0 +1,150 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+import os
+import numpy as np
+import pandas as pd
+
+
+### Machine-readable trade journal in bounded memory.
+###
+### on_order_event() follows the fills of every symbol: a fill from flat opens a trade, fills in the
+### same direction add to it at an averaged entry price, and fills against it close it, in part or
+### in full. Every close writes one row into preallocated column buffers: symbol, signal tag (the
+### entry order's tag), entry/exit time and price, closed quantity, fees, fills, realized PnL and
+### holding time, with times in UTC. When the buffers are full they are spilled to a compressed
+### .npz chunk and reused, so memory stays flat however many trades a run makes. load_journal()
+### reads the chunks back.
+###
+### from talib.journal import TradeJournal, load_journal, load_journal_frame
+### self.journal = TradeJournal(self, self.ObjectStore.GetFilePath("trade_journal"))
+### def OnOrderEvent(self, order_event): self.journal.on_order_event(order_event)
+### def OnEndOfAlgorithm(self): self.journal.close()
+###
+
+class TradeJournal:
+    def __init__(self, algorithm, path, capacity=4096, symbol_width=16, tag_width=32):
+        self.algorithm = algorithm
+        self.path = path
+        self.capacity = capacity
+        self.dtype = np.dtype([
+            ("symbol", f"S{symbol_width}"), ("tag", f"S{tag_width}"),
+            ("entry_time", "datetime64[s]"), ("exit_time", "datetime64[s]"),
+            ("quantity", "f8"), ("entry_price", "f8"), ("exit_price", "f8"),
+            ("fees", "f8"), ("pnl", "f8"), ("holding_seconds", "i8"), ("fills", "i4"),
+        ])
+        self.buffers = {name: np.empty(capacity, dtype=self.dtype[name]) for name in self.dtype.names}
+        self.count = 0
+        self.chunks = 0
+        self.open_trades = {}  # {symbol: [quantity, entry_price, entry_time, fees, fills, tag]}
+
+        self.trades = 0
+        self.fills = 0
+
+        # Chunks of an earlier run under the same path would be read back with this one
+        number = 0
+        while os.path.exists(_chunk_path(path, number)):
+            os.remove(_chunk_path(path, number))
+            number += 1
+
+    def on_order_event(self, order_event):
+        if order_event.Status != OrderStatus.Filled and order_event.Status != OrderStatus.PartiallyFilled:
+            return
+        quantity = order_event.FillQuantity
+        if quantity == 0:
+            return
+        self.fills += 1
+        symbol = order_event.Symbol
+        price = order_event.FillPrice
+        time = order_event.UtcTime
+        fee = order_event.OrderFee.Value.Amount
+
+        trade = self.open_trades.get(symbol)
+        if trade is None:
+            self._open(symbol, quantity, price, time, fee, self._tag(order_event))
+            return
+
+        held = trade[0]
+        if (held > 0) == (quantity > 0):
+            # Adding to the position
+            trade[1] = (trade[1] * held + price * quantity) / (held + quantity)
+            trade[0] = held + quantity
+            trade[3] += fee
+            trade[4] += 1
+            return
+
+        # Closing part or all of it; the rest of a fill through zero opens the next trade
+        closed = -quantity if abs(quantity) <= abs(held) else held
+        closed_fee = fee * abs(closed / quantity)
+        entry_fee = trade[3] * abs(closed / held)
+        self._record(symbol, trade, closed, price, time, entry_fee + closed_fee)
+        trade[0] = held - closed
+        trade[3] -= entry_fee
+        if trade[0] == 0:
+            del self.open_trades[symbol]
+        remainder = quantity + closed
+        if remainder != 0:
+            self._open(symbol, remainder, price, time, fee - closed_fee, self._tag(order_event))
+
+    def flush(self):
+        '''Spills the buffered rows to a chunk file.'''
+        if self.count == 0:
+            return
+        np.savez_compressed(_chunk_path(self.path, self.chunks),
+                            **{name: buffer[:self.count] for name, buffer in self.buffers.items()})
+        self.chunks += 1
+        self.count = 0
+
+    def close(self):
+        self.flush()
+
+    def _open(self, symbol, quantity, price, time, fee, tag):
+        self.open_trades[symbol] = [quantity, price, time, fee, 1, tag]
+
+    def _tag(self, order_event):
+        order = self.algorithm.Transactions.GetOrderById(order_event.OrderId)
+        return order.Tag if order is not None and order.Tag else ""
+
+    def _record(self, symbol, trade, quantity, exit_price, exit_time, fees):
+        if self.count == self.capacity:
+            self.flush()
+        i = self.count
+        held, entry_price, entry_time, _, fills, tag = trade
+        entry = np.datetime64(entry_time, "s")
+        exit = np.datetime64(exit_time, "s")
+        buffers = self.buffers
+        buffers["symbol"][i] = str(symbol.Value).encode()
+        buffers["tag"][i] = tag.encode()
+        buffers["entry_time"][i] = entry
+        buffers["exit_time"][i] = exit
+        buffers["quantity"][i] = quantity
+        buffers["entry_price"][i] = entry_price
+        buffers["exit_price"][i] = exit_price
+        buffers["fees"][i] = fees
+        buffers["pnl"][i] = (exit_price - entry_price) * quantity - fees
+        buffers["holding_seconds"][i] = (exit - entry).astype(np.int64)
+        buffers["fills"][i] = fills + 1
+        self.count += 1
+        self.trades += 1
+
+def _chunk_path(path, number):
+    return f"{path}.{number:04d}.npz"
+
+def load_journal(path):
+    '''Loads every chunk of a journal as {column: ndarray}; symbols and tags are decoded to str.'''
+    number = 0
+    parts = {}
+    while os.path.exists(_chunk_path(path, number)):
+        with np.load(_chunk_path(path, number)) as chunk:
+            for name in chunk.files:
+                parts.setdefault(name, []).append(chunk[name])
+        number += 1
+    arrays = {name: np.concatenate(columns) for name, columns in parts.items()}
+    for name in ("symbol", "tag"):
+        if name in arrays:
+            arrays[name] = arrays[name].astype(str)
+    return arrays
+
+def load_journal_frame(path):
+    '''Loads a journal as a DataFrame with one row per closed trade.'''
+    return pd.DataFrame(load_journal(path))
@@ -0,0 +1,109 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+from collections import deque
+
+
+### Level-gated, lazily formatted and buffered logging for algorithms.
+###
+### Messages below the configured level are dropped before any formatting happens: pass format
+### arguments (logger.log("{} filled at {:.2f}", symbol, price)) or a zero-argument callable instead
+### of an f-string. Accepted lines are collected in a ring buffer and written in batches when the
+### buffer fills, when flush_interval of algorithm time has passed, on errors and on flush().
+### Each message key is limited to rate_limit lines per rate_window. The key defaults to the template,
+### or for a callable to its code object, so every lambda written at one call site shares a window.
+### Expired windows are pruned on flush.
+###
+### from talib.logger import LoggerMixin
+###
+
+LEVELS = {"trace": 0, "debug": 1, "info": 2, "error": 3}
+
+class LoggerMixin:
+    def __init__(self, algorithm, level="debug", buffer_size=200, flush_interval=timedelta(days=1),
+                 rate_limit=50, rate_window=timedelta(days=1)):
+        self.algorithm = algorithm
+        self.min_level = LEVELS[level]
+        self.buffer = deque()
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.last_flush = None
+        self.rate_windows = {}  # {key: [window_start, count]}
+
+        # Suppression counters
+        self.suppressed_by_level = 0
+        self.suppressed_by_rate = 0
+
+    def is_enabled(self, level):
+        return LEVELS[level] >= self.min_level
+
+    def log(self, message, *args, level="info", key=None):
+        if LEVELS[level] < self.min_level:
+            self.suppressed_by_level += 1
+            return
+
+        now = self.algorithm.Time
+        if self.rate_limit and level != "error":
+            if key is None:
+                # A new lambda per call: key on its code, which is shared by every call from one site
+                key = message.__code__ if callable(message) and hasattr(message, "__code__") else message
+            window = self.rate_windows.get(key)
+            if window is None or now - window[0] >= self.rate_window:
+                self.rate_windows[key] = [now, 1]
+            elif window[1] >= self.rate_limit:
+                self.suppressed_by_rate += 1
+                return
+            else:
+                window[1] += 1
+
+        if callable(message):
+            line = message()
+        elif args:
+            line = message.format(*args)
+        else:
+            line = message
+        self.buffer.append((level, line))
+
+        if self.last_flush is None:
+            self.last_flush = now
+        if level == "error" or len(self.buffer) >= self.buffer_size or now - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        '''Writes the buffered lines, one call per run of lines sharing an output channel.'''
+        now = self.algorithm.Time
+        self.last_flush = now
+        self.rate_windows = {key: window for key, window in self.rate_windows.items() if now - window[0] < self.rate_window}
+        batch = []
+        batch_level = None
+        while self.buffer:
+            level, line = self.buffer.popleft()
+            if batch and self._channel(level) != self._channel(batch_level):
+                self._write(batch_level, batch)
+                batch = []
+            batch.append(line)
+            batch_level = level
+        if batch:
+            self._write(batch_level, batch)
+
+    def suppressed(self):
+        return self.suppressed_by_level + self.suppressed_by_rate
+
+    def report(self):
+        self.log("Logger: {} suppressed by level, {} by rate limit", self.suppressed_by_level, self.suppressed_by_rate, level="info")
+        self.flush()
+
+    def _channel(self, level):
+        return "error" if level == "error" else "log" if level == "info" else "debug"
+
+    def _write(self, level, lines):
+        message = "\n".join(lines)
+        channel = self._channel(level)
+        if channel == "debug":
+            self.algorithm.Debug(message)
+        elif channel == "error":
+            self.algorithm.Error(message)
+        else:
+            self.algorithm.Log(message)
@@ -0,0 +1,131 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+
+
+### Portfolio state maintained from fills.
+###
+### Counting positions or looking up holdings through algorithm.Portfolio goes through pythonnet for
+### every security the algorithm has ever held. PortfolioStateCache keeps the invested symbols,
+### long/short sets, quantities and average prices in plain Python structures, updated from the
+### fills passed to on_order_event(), so the usual questions are answered in O(1).
+### Quantity changes that do not come from fills (splits, delistings, option exercise) are caught by
+### reconcile(), which compares the cache with the real portfolio in one pass and rebuilds the
+### drifted entries; maybe_reconcile() runs it at most once per reconcile_interval of algorithm time.
+###
+### from talib.portfolio_state import PortfolioStateCache
+### self.portfolio_state = PortfolioStateCache(self)
+### def OnOrderEvent(self, order_event): self.portfolio_state.on_order_event(order_event)
+###
+
+class PortfolioStateCache:
+    def __init__(self, algorithm, reconcile_interval=timedelta(days=1)):
+        self.algorithm = algorithm
+        self.reconcile_interval = reconcile_interval
+        self.positions = {}  # {symbol: [quantity, average_price]}
+        self.long = set()
+        self.short = set()
+        self.last_reconcile = None
+
+        self.fills = 0
+        self.reconciliations = 0
+        self.drift_corrections = 0
+
+    def __contains__(self, symbol):
+        return symbol in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def invested(self):
+        return self.positions.keys()
+
+    @property
+    def long_count(self):
+        return len(self.long)
+
+    @property
+    def short_count(self):
+        return len(self.short)
+
+    def is_invested(self, symbol):
+        return symbol in self.positions
+
+    def is_long(self, symbol):
+        return symbol in self.long
+
+    def is_short(self, symbol):
+        return symbol in self.short
+
+    def quantity(self, symbol):
+        position = self.positions.get(symbol)
+        return position[0] if position is not None else 0
+
+    def average_price(self, symbol):
+        position = self.positions.get(symbol)
+        return position[1] if position is not None else 0
+
+    def unrealized_profit(self, symbol, price):
+        '''(price - average price) * quantity, without the closing fee estimate of SecurityHolding.UnrealizedProfit.'''
+        position = self.positions.get(symbol)
+        if position is None:
+            return 0
+        return (price - position[1]) * position[0]
+
+    def on_order_event(self, order_event):
+        if order_event.Status != OrderStatus.Filled and order_event.Status != OrderStatus.PartiallyFilled:
+            return
+        fill_quantity = order_event.FillQuantity
+        if fill_quantity == 0:
+            return
+        self.fills += 1
+
+        symbol = order_event.Symbol
+        price = order_event.FillPrice
+        quantity, average_price = self.positions.get(symbol, (0, 0))
+        new_quantity = quantity + fill_quantity
+        if quantity == 0 or (quantity > 0) != (new_quantity > 0):
+            # Opened, or flipped through zero: the fill price is the new average
+            average_price = price
+        elif (quantity > 0) == (fill_quantity > 0):
+            average_price = (average_price * quantity + price * fill_quantity) / new_quantity
+        # Reductions keep the average price
+        self._set(symbol, new_quantity, average_price)
+
+    def maybe_reconcile(self):
+        now = self.algorithm.Time
+        if self.last_reconcile is not None and now - self.last_reconcile < self.reconcile_interval:
+            return 0
+        return self.reconcile()
+
+    def reconcile(self):
+        '''Compares the cache with the real portfolio and fixes drifted symbols; returns how many drifted.'''
+        self.last_reconcile = self.algorithm.Time
+        self.reconciliations += 1
+        drifted = 0
+        held = set()
+        for kvp in self.algorithm.Portfolio:
+            holding = kvp.Value
+            if not holding.Invested:
+                continue
+            symbol = kvp.Key
+            held.add(symbol)
+            quantity = holding.Quantity
+            if self.quantity(symbol) != quantity:
+                self._set(symbol, quantity, holding.AveragePrice)
+                drifted += 1
+        for symbol in [symbol for symbol in self.positions if symbol not in held]:
+            self._set(symbol, 0, 0)
+            drifted += 1
+        self.drift_corrections += drifted
+        return drifted
+
+    def _set(self, symbol, quantity, average_price):
+        self.long.discard(symbol)
+        self.short.discard(symbol)
+        if quantity == 0:
+            self.positions.pop(symbol, None)
+            return
+        self.positions[symbol] = [quantity, average_price]
+        (self.long if quantity > 0 else self.short).add(symbol)
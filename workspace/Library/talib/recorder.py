@@ -0,0 +1,127 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+from time import perf_counter
+import json
+import numpy as np
+import pandas as pd
+
+
+### Per-bar signal snapshots in memory-mapped columnar files.
+###
+### SignalRecorder appends one row per evaluated symbol and bar: the bar time, the ticker and the
+### fixed-width feature columns declared up front. Every column of a segment is its own .npy file
+### opened with np.lib.format.open_memmap, so recording a bar of the whole universe is one
+### contiguous copy per column. A small JSON index next to the segments holds the column layout and
+### the row count of every segment; it is rewritten on each segment roll and on flush()/close(), so
+### a partial run stays readable up to its last flush.
+###
+### from talib.recorder import SignalRecorder, load_signals, load_signals_frame
+### recorder = SignalRecorder(self.ObjectStore.GetFilePath("signals"), [("rsi", "f4"), ("entry", "?")])
+### recorder.append(self.Time, symbols, rsi=rsi, entry=entry)
+### columns = load_signals(path); frame = load_signals_frame(path)
+###
+
+class SignalRecorder:
+    def __init__(self, path, columns, segment_rows=1 << 16, symbol_width=16):
+        '''path: base path of the index (path.json) and column segments (path.0000.<column>.npy).
+        columns: [(name, dtype)] of the feature columns; "time" and "symbol" are always recorded.'''
+        self.path = path
+        self.dtype = np.dtype([("time", "datetime64[s]"), ("symbol", f"S{symbol_width}")] + list(columns))
+        self.columns = [name for name, _ in columns]
+        self.segment_rows = segment_rows
+        self.segment_counts = []  # rows of every segment, the last one being written
+        self.segment = None  # {column: memmap} of the segment being written
+        self.position = 0
+        self.tickers = {}  # {symbol: encoded ticker}
+
+        self.rows = 0
+        self.appends = 0
+        self.seconds = 0.0
+
+    def append(self, time, symbols, **values):
+        '''Records one bar: symbols and every feature column as equal length sequences.'''
+        count = len(symbols)
+        if count == 0:
+            return
+        start = perf_counter()
+
+        tickers = self.tickers
+        encoded = []
+        for symbol in symbols:
+            ticker = tickers.get(symbol)
+            if ticker is None:
+                ticker = tickers[symbol] = str(getattr(symbol, "Value", symbol)).encode()
+            encoded.append(ticker)
+        columns = {name: np.asarray(values[name]) for name in self.columns}
+        columns["symbol"] = np.array(encoded, dtype=self.dtype["symbol"])
+        stamp = np.datetime64(time, "s")
+
+        offset = 0
+        while offset < count:
+            if self.segment is None or self.position == self.segment_rows:
+                self._roll()
+            rows = min(count - offset, self.segment_rows - self.position)
+            end = self.position + rows
+            self.segment["time"][self.position:end] = stamp
+            for name, column in columns.items():
+                self.segment[name][self.position:end] = column[offset:offset + rows]
+            self.position += rows
+            self.segment_counts[-1] = self.position
+            offset += rows
+
+        self.rows += count
+        self.appends += 1
+        self.seconds += perf_counter() - start
+
+    def flush(self):
+        if self.segment is not None:
+            for column in self.segment.values():
+                column.flush()
+        self._write_index()
+
+    def close(self):
+        self.flush()
+        self.segment = None
+
+    def _roll(self):
+        if self.segment is not None:
+            for column in self.segment.values():
+                column.flush()
+        number = len(self.segment_counts)
+        self.segment = {name: np.lib.format.open_memmap(_segment_path(self.path, number, name), mode="w+",
+                                                        dtype=self.dtype[name], shape=(self.segment_rows,))
+                        for name in self.dtype.names}
+        self.position = 0
+        self.segment_counts.append(0)
+        self._write_index()
+
+    def _write_index(self):
+        with open(f"{self.path}.json", "w") as index:
+            json.dump({"dtype": self.dtype.descr, "segments": self.segment_counts}, index)
+
+def _segment_path(path, number, column):
+    return f"{path}.{number:04d}.{column}.npy"
+
+def load_signals(path, columns=None):
+    '''Loads a recording as {column: ndarray}; symbols are decoded to str.'''
+    with open(f"{path}.json") as index:
+        layout = json.load(index)
+    dtype = np.dtype([tuple(field) for field in layout["dtype"]])
+    names = list(columns) if columns is not None else list(dtype.names)
+    parts = {name: [] for name in names}
+    for number, count in enumerate(layout["segments"]):
+        if count == 0:
+            continue
+        for name in names:
+            parts[name].append(np.asarray(np.load(_segment_path(path, number, name), mmap_mode="r")[:count]))
+    arrays = {}
+    for name in names:
+        arrays[name] = np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype[name])
+    if "symbol" in arrays:
+        arrays["symbol"] = arrays["symbol"].astype(str)
+    return arrays
+
+def load_signals_frame(path, columns=None):
+    '''Loads a recording as a DataFrame with one row per recorded symbol and bar.'''
+    return pd.DataFrame(load_signals(path, columns))
@@ -0,0 +1,84 @@
+#region imports
+from AlgorithmImports import *
+#endregion
+from bisect import bisect_left
+import numpy as np
+
+
+### Compiled fundamental screen for fine universe selection.
+###
+### Market-cap tiers are merged into sorted, non-overlapping closed intervals and the sector codes
+### into a set once, at construction. Each selection extracts MarketCap and MorningstarSectorCode in
+### a single pass over the fundamentals and applies both filters vectorized.
+###
+### from talib.screening import FundamentalScreen
+### screen = FundamentalScreen.from_tiers(["micro", "small"], {"micro": (0, 3e8), "small": (3e8, 2e9)}, [311])
+### symbols = screen.select(fine)
+###
+
+def merge_intervals(intervals):
+    '''Merges closed (low, high) intervals into a sorted list of disjoint intervals.'''
+    merged = []
+    for low, high in sorted(intervals):
+        if merged and low <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    return [(low, high) for low, high in merged]
+
+class FundamentalScreen:
+
+    def __init__(self, cap_ranges=None, sector_codes=None):
+        '''cap_ranges: iterable of closed (min_cap, max_cap) ranges, None for any market cap.
+        sector_codes: MorningstarSectorCode values to keep, None for any sector.'''
+        intervals = merge_intervals(cap_ranges) if cap_ranges is not None else None
+        self.lows = np.array([low for low, _ in intervals], dtype=float) if intervals is not None else None
+        self.highs = np.array([high for _, high in intervals], dtype=float) if intervals is not None else None
+        self.sector_codes = frozenset(int(code) for code in sector_codes) if sector_codes is not None else None
+        self.sector_array = np.array(sorted(self.sector_codes), dtype=np.int64) if sector_codes is not None else None
+
+    @classmethod
+    def from_tiers(cls, tiers, thresholds, sector_codes=None):
+        '''Builds a screen from tier names looked up in a {tier: (min_cap, max_cap)} table; unknown tiers are ignored.'''
+        return cls([thresholds[tier] for tier in tiers if tier in thresholds], sector_codes)
+
+    def matches(self, market_cap, sector_code):
+        '''Scalar form of the screen, for a single fundamental.'''
+        if self.sector_codes is not None and sector_code not in self.sector_codes:
+            return False
+        if self.highs is None:
+            return True
+        i = bisect_left(self.highs, market_cap)
+        return i < len(self.highs) and self.lows[i] <= market_cap
+
+    def mask(self, fine):
+        '''Returns (fundamentals as a list, boolean mask of those passing the screen).'''
+        fine = list(fine)
+        count = len(fine)
+        caps = np.empty(count)
+        sectors = np.zeros(count, dtype=np.int64)
+        for i, f in enumerate(fine):
+            caps[i] = f.MarketCap or 0
+            classification = f.AssetClassification
+            if classification is not None:
+                sectors[i] = classification.MorningstarSectorCode or 0
+
+        selected = np.ones(count, dtype=bool)
+        if self.highs is not None:
+            # First interval whose upper bound is >= the cap, then check its lower bound
+            i = np.searchsorted(self.highs, caps, side="left")
+            inside = i < len(self.highs)
+            selected &= inside
+            selected[inside] &= self.lows[i[inside]] <= caps[inside]
+        if self.sector_array is not None:
+            selected &= np.isin(sectors, self.sector_array)
+        return fine, selected
+
+    def filter(self, fine):
+        '''Fundamentals passing the screen, in their original order.'''
+        fine, selected = self.mask(fine)
+        return [f for f, keep in zip(fine, selected) if keep]
+
+    def select(self, fine):
+        '''Symbols passing the screen, in their original order.'''
+        return [f.Symbol for f in self.filter(fine)]
@@ -0,0 +1,95 @@
+# region imports
+from AlgorithmImports import *
+# endregion
+import json
+import os
+
+class EarningsCalendar:
+    '''Earnings calendar index: report file date -> symbols, persisted between runs.
+
+    The index grows from the EarningReports.FileDate of the fine fundamentals it is shown. A day
+    whose fundamentals were scanned once is never scanned again, so a rerun over a known period
+    answers "who reported yesterday" with a dictionary lookup. On a new day only symbols that can
+    have filed since their last known report are read: a symbol that filed less than
+    min_report_gap_days before the day is skipped, since reports are quarterly. A last known
+    report after the day (a rerun over an earlier period) skips nothing.
+
+    Symbols are stored as [security identifier, ticker] pairs in a JSON file.'''
+
+    def __init__(self, path, min_report_gap_days=45):
+        self.path = path
+        self.min_report_gap = timedelta(days=min_report_gap_days)
+        self.dates = {}        # {file date: set of symbols}
+        self.last_filed = {}   # {symbol: latest known file date}
+        self.scanned = set()   # days whose fundamentals were scanned
+        self.dirty = False
+
+        self.lookups = 0
+        self.reads = 0
+        self.skipped = 0
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as file:
+            stored = json.load(file)
+        symbols = {}
+        def symbol_of(pair):
+            sid, ticker = pair
+            if sid not in symbols:
+                symbols[sid] = Symbol(SecurityIdentifier.Parse(sid), ticker)
+            return symbols[sid]
+        for day, pairs in stored["dates"].items():
+            self.dates[date.fromisoformat(day)] = {symbol_of(pair) for pair in pairs}
+        for day, pairs in stored["last_filed"].items():
+            filed = date.fromisoformat(day)
+            for pair in pairs:
+                self.last_filed[symbol_of(pair)] = filed
+        self.scanned = {date.fromisoformat(day) for day in stored["scanned"]}
+        return True
+
+    def save(self):
+        if not self.dirty:
+            return
+        def pairs(symbols):
+            return sorted([str(symbol.ID), symbol.Value] for symbol in symbols)
+        by_last_filed = {}
+        for symbol, filed in self.last_filed.items():
+            by_last_filed.setdefault(filed, []).append(symbol)
+        stored = {
+            "dates": {day.isoformat(): pairs(symbols) for day, symbols in sorted(self.dates.items())},
+            "last_filed": {day.isoformat(): pairs(symbols) for day, symbols in sorted(by_last_filed.items())},
+            "scanned": sorted(day.isoformat() for day in self.scanned),
+        }
+        with open(self.path, "w") as file:
+            json.dump(stored, file)
+        self.dirty = False
+
+    def reporters(self, day, file_date, fine):
+        '''Fundamentals among fine whose report was filed on file_date, scanning day first if it is new.'''
+        self.lookups += 1
+        fine_by_symbol = {f.Symbol: f for f in fine}
+        if day not in self.scanned:
+            self._scan(day, fine_by_symbol)
+        return [fine_by_symbol[symbol] for symbol in self.dates.get(file_date, ()) if symbol in fine_by_symbol]
+
+    def upcoming(self, start, end):
+        '''{file date: symbols} for the known file dates in [start, end].'''
+        return {day: symbols for day, symbols in self.dates.items() if start <= day <= end}
+
+    def _scan(self, day, fine_by_symbol):
+        for symbol, f in fine_by_symbol.items():
+            filed = self.last_filed.get(symbol)
+            if filed is not None and timedelta(0) <= day - filed < self.min_report_gap:
+                self.skipped += 1
+                continue
+            self.reads += 1
+            file_date = f.EarningReports.FileDate
+            if file_date is None or file_date.year < 1900:
+                continue
+            file_date = file_date.date()
+            self.dates.setdefault(file_date, set()).add(symbol)
+            if filed is None or file_date > filed:
+                self.last_filed[symbol] = file_date
+        self.scanned.add(day)
+        self.dirty = True
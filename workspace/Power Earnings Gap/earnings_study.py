@@ -0,0 +1,179 @@
+'''Offline event study of earnings gaps for PowerEarningsGap.
+
+Every earnings file date is an event. The event session is the last session on or before the file
+date, i.e. the "day after earnings" bar AfterMarketOpen reads the next morning, and the session
+before it supplies closeDayBeforeEarnings. percentGap, closeStrength and the fade flag use exactly
+the formulas of AfterMarketOpen, and the long (gap above gap_up_threshold and not faded) and short
+(gap below short_gap_threshold) signals apply its rules. Forward returns are measured from the open
+of the session after the event, where the algorithm's market orders fill, to the close horizon
+sessions after the event session, signed by the side of the trade.
+
+build_panels turns a daily OHLCV history frame (e.g. from a QuantBook History call in research)
+into (dates x symbols) arrays and save_panels caches them as a compressed .npz. load_events reads
+the file dates from the earnings_calendar.json the algorithm writes, or from a CSV with symbol and
+file_date columns. run_study evaluates the events year by year in a process pool and caches the
+event table under a hash of the panels, events and parameters, so reruns with the same inputs are
+a single file read.
+
+    python earnings_study.py storage/earnings_panels_<key>.npz storage/earnings_calendar.json --summary
+'''
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PARAMETERS = {
+    "gap_up_threshold": 0.8,
+    "short_gap_threshold": 0.08,
+    "horizons": (1, 5, 10, 20),
+}
+
+def panel_key(symbols, start, end):
+    '''Stable cache key for a universe and date range.'''
+    text = "|".join([",".join(sorted(str(s) for s in symbols)), str(start), str(end)])
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+def build_panels(history):
+    '''Builds the (dates x symbols) OHLCV panels from a daily history frame indexed by (symbol, time).
+    Columns are tickers, which is how load_events names the event symbols.'''
+    close = history["close"].unstack(level=0).sort_index()
+    panels = {name: history[name].unstack(level=0).reindex_like(close).to_numpy(dtype=float)
+              for name in ("open", "high", "low", "volume")}
+    panels["close"] = close.to_numpy(dtype=float)
+    panels["dates"] = close.index.to_numpy(dtype="datetime64[D]")
+    panels["symbols"] = np.array([getattr(s, "Value", str(s).split(" ")[0]) for s in close.columns])
+    return panels
+
+def save_panels(panels, directory):
+    key = panel_key(panels["symbols"], panels["dates"][0], panels["dates"][-1])
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"earnings_panels_{key}.npz")
+    np.savez_compressed(path, **panels)
+    return path
+
+def load_panels(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def load_events(path):
+    '''(symbol, file_date) events from an EarningsCalendar JSON file or a CSV with symbol and file_date columns.'''
+    if path.endswith(".json"):
+        with open(path) as file:
+            stored = json.load(file)
+        rows = [(ticker, day) for day, pairs in stored["dates"].items() for _, ticker in pairs]
+        events = pd.DataFrame(rows, columns=["symbol", "file_date"])
+    else:
+        events = pd.read_csv(path, usecols=["symbol", "file_date"])
+    events["file_date"] = pd.to_datetime(events["file_date"]).dt.normalize()
+    return events.drop_duplicates().sort_values(["file_date", "symbol"]).reset_index(drop=True)
+
+def study_key(panels_path, events, parameters):
+    '''Cache key over the panel file, the events and the study parameters.'''
+    digest = hashlib.sha1()
+    with open(panels_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(pd.util.hash_pandas_object(events, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(parameters, sort_keys=True, default=list).encode())
+    return digest.hexdigest()[:16]
+
+def event_table(panels, events, gap_up_threshold, short_gap_threshold, horizons):
+    '''One row per event with the AfterMarketOpen metrics, the signal and the signed forward returns.'''
+    dates, symbols = panels["dates"], panels["symbols"]
+    columns = pd.Index(symbols).get_indexer(events["symbol"])
+    # last session on or before the file date
+    rows = np.searchsorted(dates, events["file_date"].to_numpy(dtype="datetime64[D]"), side="right") - 1
+    valid = (columns >= 0) & (rows >= 1) & (rows + 1 < len(dates))
+    events, rows, columns = events[valid].reset_index(drop=True), rows[valid], columns[valid]
+
+    open_, high, close = panels["open"], panels["high"], panels["close"]
+    openDayAfterEarnings = open_[rows, columns]
+    highDayAfterEarnings = high[rows, columns]
+    closeDayAfterEarnings = close[rows, columns]
+    closeDayBeforeEarnings = close[rows - 1, columns]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        percentGap = (openDayAfterEarnings - closeDayBeforeEarnings) / closeDayBeforeEarnings
+        closeStrength = (closeDayAfterEarnings - openDayAfterEarnings) / (highDayAfterEarnings - openDayAfterEarnings)
+    faded = closeDayAfterEarnings <= closeDayBeforeEarnings
+
+    side = np.zeros(len(rows), dtype=np.int8)
+    side[percentGap < short_gap_threshold] = -1
+    side[(percentGap > gap_up_threshold) & ~faded] = 1
+
+    table = events.assign(session=dates[rows], percentGap=percentGap, closeStrength=closeStrength,
+                          faded=faded, side=side)
+    entry = open_[rows + 1, columns]
+    for horizon in horizons:
+        exit_rows = rows + horizon
+        reachable = exit_rows < len(dates)
+        exit_price = np.full(len(rows), np.nan)
+        exit_price[reachable] = close[exit_rows[reachable], columns[reachable]]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            table[f"return_{horizon}"] = side * (exit_price / entry - 1)
+    return table[np.isfinite(percentGap)].reset_index(drop=True)
+
+_panels = None
+
+def _init_worker(path):
+    global _panels
+    _panels = load_panels(path)
+
+def _evaluate_year(task):
+    events, parameters = task
+    return event_table(_panels, events, **parameters)
+
+def run_study(panels_path, events, parameters=None, processes=None, cache_directory=None):
+    '''Event table for every event, evaluated one year per task and cached by parameter hash.'''
+    parameters = dict(DEFAULT_PARAMETERS, **(parameters or {}))
+    parameters["horizons"] = tuple(parameters["horizons"])
+    cache_directory = cache_directory or os.path.dirname(os.path.abspath(panels_path))
+    cache_path = os.path.join(cache_directory, f"earnings_study_{study_key(panels_path, events, parameters)}.csv.gz")
+    if os.path.exists(cache_path):
+        return pd.read_csv(cache_path, parse_dates=["file_date", "session"])
+
+    tasks = [(year_events, parameters) for _, year_events in events.groupby(events["file_date"].dt.year)]
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(panels_path,)) as pool:
+        tables = list(pool.map(_evaluate_year, tasks))
+
+    table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+    os.makedirs(cache_directory, exist_ok=True)
+    table.to_csv(cache_path, index=False)
+    return table
+
+def summarize(table, horizons=DEFAULT_PARAMETERS["horizons"]):
+    '''Forward return distribution per side: count, mean, win rate and quartiles for every horizon.'''
+    rows = []
+    for side, trades in table[table["side"] != 0].groupby("side"):
+        for horizon in horizons:
+            returns = trades[f"return_{horizon}"].dropna().to_numpy()
+            if not len(returns):
+                continue
+            q1, median, q3 = np.percentile(returns, [25, 50, 75])
+            rows.append({"side": "long" if side > 0 else "short", "horizon": horizon, "trades": len(returns),
+                         "mean_return": returns.mean(), "win_rate": (returns > 0).mean(),
+                         "q1": q1, "median": median, "q3": q3})
+    return pd.DataFrame(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Event study of PowerEarningsGap earnings gaps over cached daily panels.")
+    parser.add_argument("panels", help="Path to a .npz written by save_panels")
+    parser.add_argument("events", help="earnings_calendar.json or a CSV with symbol and file_date columns")
+    parser.add_argument("--gap-up-threshold", type=float, default=DEFAULT_PARAMETERS["gap_up_threshold"])
+    parser.add_argument("--short-gap-threshold", type=float, default=DEFAULT_PARAMETERS["short_gap_threshold"])
+    parser.add_argument("--horizons", type=int, nargs="+", default=list(DEFAULT_PARAMETERS["horizons"]))
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--out", default="earnings_study.csv")
+    parser.add_argument("--summary", action="store_true")
+    args = parser.parse_args()
+
+    parameters = {"gap_up_threshold": args.gap_up_threshold, "short_gap_threshold": args.short_gap_threshold,
+                  "horizons": args.horizons}
+    study = run_study(args.panels, load_events(args.events), parameters, processes=args.processes)
+    study.to_csv(args.out, index=False)
+    if args.summary:
+        print(summarize(study, args.horizons).to_string())
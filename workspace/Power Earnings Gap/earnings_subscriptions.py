@@ -0,0 +1,81 @@
+# region imports
+from AlgorithmImports import *
+# endregion
+
+class EarningsSubscriptionScheduler:
+    '''Minute subscriptions only around earnings events.
+
+    Once per session, update() subscribes a symbol at minute resolution from sessions_before
+    sessions ahead of its earnings file date until sessions_after sessions past it, and removes it
+    afterwards. The file dates come from the EarningsCalendar, so events ahead of the current day
+    are only known for periods the calendar has already indexed in an earlier run; otherwise a
+    symbol is subscribed on the first session after its report was seen.
+
+    The subscriptions only supply data. Only symbols added here are removed, and a symbol still held
+    when its window closes keeps its subscription, because removing a security liquidates it; so
+    does a symbol for which is_member(symbol) says the algorithm's universe holds it. Removal is
+    retried at the next update().'''
+
+    def __init__(self, algorithm, calendar, exchange_hours, sessions_before=2, sessions_after=3, is_member=None):
+        self.algorithm = algorithm
+        self.calendar = calendar
+        self.exchange_hours = exchange_hours
+        self.sessions_before = sessions_before
+        self.sessions_after = sessions_after
+        self.is_member = is_member
+        self.subscribed = set()
+        self.open_days = {}  # {date: is a session}
+
+        self.updates = 0
+        self.total_subscriptions = 0
+        self.peak_subscriptions = 0
+        self.added = 0
+        self.removed = 0
+
+    @property
+    def average_subscriptions(self):
+        return self.total_subscriptions / self.updates if self.updates else 0
+
+    def update(self, day, required=()):
+        '''Brings the minute subscriptions in line with the event windows around day, plus the required
+        symbols (those traded today), whatever the window settings.'''
+        # Calendar-day bounds wide enough for the session windows, narrowed per file date below
+        start = day - timedelta(days=2 * self.sessions_after + 7)
+        end = day + timedelta(days=2 * self.sessions_before + 7)
+        wanted = set()
+        for file_date, symbols in self.calendar.upcoming(start, end).items():
+            offset = self._session_offset(day, file_date)
+            if -self.sessions_before <= offset <= self.sessions_after:
+                wanted.update(symbols)
+        wanted.update(required)
+
+        for symbol in wanted - self.subscribed:
+            self.algorithm.AddSecurity(symbol, Resolution.Minute)
+            self.subscribed.add(symbol)
+            self.added += 1
+
+        portfolio = self.algorithm.Portfolio
+        for symbol in self.subscribed - wanted:
+            if portfolio[symbol].Invested or (self.is_member is not None and self.is_member(symbol)):
+                continue
+            self.algorithm.RemoveSecurity(symbol)
+            self.subscribed.discard(symbol)
+            self.removed += 1
+
+        count = len(self.subscribed)
+        self.updates += 1
+        self.total_subscriptions += count
+        self.peak_subscriptions = max(self.peak_subscriptions, count)
+        return count
+
+    def _session_offset(self, day, file_date):
+        '''Sessions from file_date to day: 0 on a file date that is a session, 1 on the next session, -1 on the session before.'''
+        if day >= file_date:
+            return sum(self._is_session(file_date + timedelta(days=i)) for i in range(1, (day - file_date).days + 1))
+        return -sum(self._is_session(day + timedelta(days=i)) for i in range((file_date - day).days))
+
+    def _is_session(self, day):
+        is_open = self.open_days.get(day)
+        if is_open is None:
+            is_open = self.open_days[day] = self.exchange_hours.IsDateOpen(datetime.combine(day, time.min))
+        return is_open
@@ -1,4 +1,6 @@
 from AlgorithmImports import *
+from earnings_calendar import EarningsCalendar
+from earnings_subscriptions import EarningsSubscriptionScheduler
 
 class PowerEarningsGap(QCAlgorithm):
 
@@ -7,15 +9,31 @@ class PowerEarningsGap(QCAlgorithm):
         self.SetEndDate(2023, 1, 1)
         self.SetCash(100000000)
 
+        # earnings file dates indexed by day, kept in the object store so reruns only look them up
+        self.earningsCalendar = EarningsCalendar(self.ObjectStore.GetFilePath("earnings_calendar.json"))
+        if self.earningsCalendar.load():
+            self.Debug(f"Loaded earnings calendar with {len(self.earningsCalendar.dates)} file dates")
+
         # add SPY so that we can use it in the schedule rule below
         self.SPY = self.AddEquity('SPY', Resolution.Minute).Symbol
 
         # build a universe using the CoarseFilter and FineFilter functions defined below
+        # universe members stay at daily resolution, minute data comes from the earnings windows below
+        self.UniverseSettings.Resolution = Resolution.Daily
         self.AddUniverse(self.CoarseFilter, self.FineFilter)
 
         self.SPY = self.AddEquity("SPY").Symbol
+        # the reporters picked by FineFilter for the day, the only symbols traded
+        self.reporters = []
         self.Schedule.On(self.DateRules.EveryDay("SPY"), self.TimeRules.AfterMarketOpen("SPY", 1), self.AfterMarketOpen)
 
+        # minute subscriptions only from N sessions before to M sessions after each earnings file date
+        self.earningsSubscriptions = EarningsSubscriptionScheduler(self, self.earningsCalendar, self.Securities[self.SPY].Exchange.Hours,
+                                                                   int(self.GetParameter("minute_sessions_before", 2)),
+                                                                   int(self.GetParameter("minute_sessions_after", 3)),
+                                                                   lambda symbol: symbol in self.reporters)
+        self.Schedule.On(self.DateRules.EveryDay("SPY"), self.TimeRules.BeforeMarketOpen("SPY", 30), self.UpdateSubscriptions)
+
 
     def CoarseFilter(self, universe):
         # filter universe, ensure DollarVolume is above a certain threshold
@@ -37,71 +55,77 @@ class PowerEarningsGap(QCAlgorithm):
         return symbolObjects
 
     def FineFilter(self, coarseUniverse):
-        yesterday = self.Time - timedelta(days=1)
+        yesterday = (self.Time - timedelta(days=1)).date()
 
-        fineUniverse = [asset.Symbol for asset in coarseUniverse if asset.EarningReports.FileDate == yesterday and asset.MarketCap > 5e8]
+        reporters = self.earningsCalendar.reporters(self.Time.date(), yesterday, coarseUniverse)
+        fineUniverse = [asset.Symbol for asset in reporters if asset.MarketCap > 5e8]
 
         tickerSymbolValuesOnly = [symbol.Value for symbol in fineUniverse]
 
+        # the minute subscriptions of the earnings windows only supply data, trades come from this list
+        self.reporters = fineUniverse
+
         return fineUniverse
 
 
+    def UpdateSubscriptions(self):
+        # the day's reporters are traded at the open, so they always get minute data before it
+        self.earningsSubscriptions.update(self.Time.date(), self.reporters)
+
     def AfterMarketOpen(self):
-        for security in self.ActiveSecurities.Values:
-            symbol = security.Symbol
-
-            if symbol == self.SPY:
-                continue
-
-            historyData = self.History(symbol, 2, Resolution.Daily)
-            historyHourlyData = self.History(symbol, 24, Resolution.Hour)
-
-            self.set
-            try:
-                openDayAfterEarnings = historyData['open'][-1]
-                closeDayAfterEarnings = historyData['close'][-1]
-                highDayAfterEarnings = historyData['high'][-1]
-                closeDayBeforeEarnings = historyData['close'][-2]
-            except:
-                self.Debug(f"History data unavailable for {symbol.Value}")
-                continue
-
-            priceGap = openDayAfterEarnings - closeDayBeforeEarnings
-            percentGap = priceGap / closeDayBeforeEarnings
-            closeStrength = (closeDayAfterEarnings - openDayAfterEarnings) / (highDayAfterEarnings - openDayAfterEarnings)
-
-            '''
-            if percentGap > 0.02 and percentGap < 0.8:
-                self.MarketOrder(symbol, (-1000/closeDayAfterEarnings))
-            '''
-            if percentGap > 0.8:
-                self.Debug(f"{symbol.Value} gapped up by {percentGap} - {closeDayBeforeEarnings} {openDayAfterEarnings}")
-
-                #if closeDayAfterEarnings > closeDayBeforeEarnings and closeStrength > 0.5:
-                if closeDayAfterEarnings > closeDayBeforeEarnings:
-                    self.Debug(f"{symbol.Value} closed strong!")
-                    self.MarketOrder(symbol, +1000/closeDayAfterEarnings)
-                else:
-                    self.Debug(f"{symbol.Value} faded after earnings")
-            
-            '''
-            if percentGap < -0.02 and percentGap > -0.08:
-                #if closeDayAfterEarnings < closeDayBeforeEarnings and closeStrength < -0.5:
-                if closeDayAfterEarnings < closeDayBeforeEarnings:
-                    self.Debug(f"{symbol.Value} gapped down by {percentGap} - {closeDayBeforeEarnings} {openDayAfterEarnings}")
-                    self.MarketOrder(symbol, +1000/closeDayAfterEarnings)
-            '''
-            
-            if percentGap < 0.08:
-                    self.MarketOrder(symbol, -1000/closeDayAfterEarnings)
-
-            '''
-            self.Debug(f"{symbol.Value} gapped up by {percentGap} - {closeDayBeforeEarnings} {openDayAfterEarnings}")
-
-            if closeDayAfterEarnings > closeDayBeforeEarnings:
-                self.Debug(f"{symbol.Value} closed strong!")
-                self.MarketOrder(symbol, 100)
-            else:
-                self.Debug(f"{symbol.Value} faded after earnings")
-                self.MarketOrder(symbol, -100)
-            '''
\ No newline at end of file
+        symbols = [symbol for symbol in self.reporters if symbol != self.SPY]
+        if not symbols:
+            return
+
+        # one request for the whole earnings-day universe: the earnings day and the day after
+        history = self.History(symbols, 2, Resolution.Daily)
+        if history.empty:
+            self.Debug(f"History data unavailable for {len(symbols)} symbols")
+            return
+
+        opens = history['open'].unstack(level=0)
+        highs = history['high'].unstack(level=0)
+        closes = history['close'].unstack(level=0)
+        if len(closes) < 2:
+            self.Debug(f"History data unavailable for {len(symbols)} symbols")
+            return
+
+        # one row per symbol, one column per metric
+        candidates = pd.DataFrame({
+            'openDayAfterEarnings': opens.iloc[-1],
+            'closeDayAfterEarnings': closes.iloc[-1],
+            'highDayAfterEarnings': highs.iloc[-1],
+            'closeDayBeforeEarnings': closes.iloc[-2],
+        }).dropna()
+
+        missing = len(symbols) - len(candidates)
+        if missing:
+            self.Debug(f"History data unavailable for {missing} symbols")
+
+        candidates['percentGap'] = (candidates.openDayAfterEarnings - candidates.closeDayBeforeEarnings) / candidates.closeDayBeforeEarnings
+        candidates['closeStrength'] = (candidates.closeDayAfterEarnings - candidates.openDayAfterEarnings) / (candidates.highDayAfterEarnings - candidates.openDayAfterEarnings)
+        candidates['faded'] = candidates.closeDayAfterEarnings <= candidates.closeDayBeforeEarnings
+        candidates['quantity'] = 1000 / candidates.closeDayAfterEarnings
+
+        #shorts = -candidates[(candidates.percentGap > 0.02) & (candidates.percentGap < 0.8)].quantity
+        gappedUp = candidates[candidates.percentGap > 0.8]
+        for symbol, row in gappedUp.iterrows():
+            self.Debug(f"{symbol.Value} gapped up by {row.percentGap} - {row.closeDayBeforeEarnings} {row.openDayAfterEarnings}")
+            self.Debug(f"{symbol.Value} faded after earnings" if row.faded else f"{symbol.Value} closed strong!")
+
+        #longs = gappedUp[~gappedUp.faded & (gappedUp.closeStrength > 0.5)].quantity
+        longs = gappedUp[~gappedUp.faded].quantity
+        shorts = -candidates[candidates.percentGap < 0.08].quantity
+
+        # submit the whole order list without waiting on each fill
+        orders = pd.concat([longs, shorts])
+        for symbol, quantity in orders.items():
+            self.MarketOrder(symbol, quantity, asynchronous=True)
+
+    def OnEndOfAlgorithm(self):
+        calendar = self.earningsCalendar
+        calendar.save()
+        self.Debug(f"Earnings calendar: {calendar.lookups} lookups, {calendar.reads} file dates read, {calendar.skipped} skipped")
+        subscriptions = self.earningsSubscriptions
+        self.Debug(f"Earnings minute subscriptions: peak {subscriptions.peak_subscriptions}, average {subscriptions.average_subscriptions:.1f} "
+                   f"over {subscriptions.updates} sessions, {subscriptions.added} added, {subscriptions.removed} removed")
@@ -13,19 +13,26 @@
 
 from AlgorithmImports import *
 from Selection.UniverseSelectionModel import UniverseSelectionModel
+import heapq
 
 class ETFConstituentsUniverseSelectionModel(UniverseSelectionModel):
-    '''Universe selection model that selects the constituents of an ETF.'''
+    '''Universe selection model that selects the constituents of an ETF.
+
+    Selection returns Universe.UNCHANGED when the ETF's constituent set is the same as on the
+    previous selection, so the engine does no add/remove work on days membership did not change.
+    When top_n is set, the top_n constituents by weight are kept with a heap instead of a full sort.'''
 
     def __init__(self,
                  etf_symbol,
                  universe_settings = None,
-                 universe_filter_func = None):
+                 universe_filter_func = None,
+                 top_n = None):
         '''Initializes a new instance of the ETFConstituentsUniverseSelectionModel class
         Args:
             etfSymbol: Symbol of the ETF to get constituents for
             universeSettings: Universe settings
-            universeFilterFunc: Function to filter universe results'''
+            universeFilterFunc: Function to filter universe results
+            topN: Keep only the N largest constituents by weight (zero weights are dropped)'''
         if type(etf_symbol) is str:
             symbol = SymbolCache.try_get_symbol(etf_symbol, None)
             if symbol[0] and symbol[1].security_type == SecurityType.EQUITY:
@@ -36,8 +43,14 @@ class ETFConstituentsUniverseSelectionModel(UniverseSelectionModel):
             self.etf_symbol = etf_symbol
         self.universe_settings = universe_settings
         self.universe_filter_function = universe_filter_func
+        self.top_n = top_n
 
         self.universe = None
+        self.last_constituents = None
+
+        # Selection counters
+        self.selections = 0
+        self.unchanged_selections = 0
 
     def create_universes(self, algorithm: QCAlgorithm) -> list[Universe]:
         '''Creates a new ETF constituents universe using this class's selection function
@@ -46,5 +59,30 @@ class ETFConstituentsUniverseSelectionModel(UniverseSelectionModel):
         Returns:
             The universe defined by this model'''
         if self.universe is None:
-            self.universe = algorithm.universe.etf(self.etf_symbol, self.universe_settings, self.universe_filter_function)
+            self.universe = algorithm.universe.etf(self.etf_symbol, self.universe_settings, self.select)
         return [self.universe]
+
+    def select(self, constituents: list[ETFConstituentUniverse]) -> list[Symbol]:
+        '''Short-circuits unchanged constituent sets, then applies top_n and the user filter
+        Args:
+            constituents: The ETF constituents for the current selection
+        Returns:
+            The selected symbols, or Universe.UNCHANGED'''
+        constituents = list(constituents)
+        self.selections += 1
+
+        current = frozenset(c.symbol for c in constituents)
+        if current == self.last_constituents:
+            self.unchanged_selections += 1
+            return Universe.UNCHANGED
+        self.last_constituents = current
+
+        if self.top_n is not None:
+            weighted = [c for c in constituents if c.weight]
+            if len(weighted) > self.top_n:
+                weighted = heapq.nlargest(self.top_n, weighted, key=lambda c: c.weight)
+            constituents = weighted
+
+        if self.universe_filter_function is not None:
+            return self.universe_filter_function(constituents)
+        return [c.symbol for c in constituents]
@@ -0,0 +1,117 @@
+# region imports
+from AlgorithmImports import *
+# endregion
+import heapq
+import itertools
+
+class PendingEntry:
+    __slots__ = ("symbol", "score", "signal_date", "expiry_date", "key")
+
+    def __init__(self, symbol, score, signal_date, expiry_date, key):
+        self.symbol = symbol
+        self.score = score
+        self.signal_date = signal_date
+        self.expiry_date = expiry_date
+        self.key = key
+
+class EntryQueue:
+    '''Bounded priority queue of pending entries, ranked by signal strength.
+
+    Three heaps share the entries: best-first for releasing entries into free slots,
+    worst-first for evicting when the queue is over max_size, and by expiry date so stale
+    signals are dropped in O(log n). Entries removed through one heap are left in the others
+    and skipped lazily (their key no longer matches the live entry for that symbol).'''
+
+    def __init__(self, max_size, ttl_days):
+        self.max_size = max_size
+        self.ttl_days = ttl_days
+        self.entries = {}  # {symbol: PendingEntry}
+        self.best = []     # (-score, key, entry)
+        self.worst = []    # (score, -key, entry)
+        self.expiries = [] # (expiry_date, key, entry)
+        self.counter = itertools.count()
+
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, symbol):
+        return symbol in self.entries
+
+    def push(self, symbol, score, signal_date):
+        if symbol in self.entries:
+            return
+        entry = PendingEntry(symbol, score, signal_date, signal_date + timedelta(days=self.ttl_days), next(self.counter))
+        self._insert(entry)
+
+        while len(self.entries) > self.max_size:
+            weakest = self._pop_live(self.worst)
+            del self.entries[weakest.symbol]
+            self.evicted += 1
+
+    def requeue(self, entry):
+        '''Puts back an entry returned by pop_best that could not be acted on yet.'''
+        if entry.symbol not in self.entries:
+            entry.key = next(self.counter)
+            self._insert(entry)
+
+    def discard(self, symbol):
+        self.entries.pop(symbol, None)
+
+    def expire(self, date):
+        while self.expiries and self.expiries[0][0] < date:
+            _, key, entry = heapq.heappop(self.expiries)
+            if self._is_live(entry, key):
+                del self.entries[entry.symbol]
+                self.expired += 1
+
+    def pop_best(self, date):
+        '''Removes and returns the strongest entry signalled before date, or None.'''
+        held = []
+        found = None
+        while self.best:
+            entry = self._pop_live(self.best)
+            if entry is None:
+                break
+            if entry.signal_date < date:
+                found = entry
+                break
+            held.append(entry)
+
+        for entry in held:
+            heapq.heappush(self.best, (-entry.score, entry.key, entry))
+        if found is not None:
+            del self.entries[found.symbol]
+        return found
+
+    def _insert(self, entry):
+        self.entries[entry.symbol] = entry
+        heapq.heappush(self.best, (-entry.score, entry.key, entry))
+        heapq.heappush(self.worst, (entry.score, -entry.key, entry))
+        heapq.heappush(self.expiries, (entry.expiry_date, entry.key, entry))
+        if len(self.best) + len(self.worst) + len(self.expiries) > 6 * (len(self.entries) + 16):
+            self._compact()
+
+    def _compact(self):
+        # Rebuild the heaps from live entries once lazily-deleted items dominate them
+        live = list(self.entries.values())
+        self.best = [(-e.score, e.key, e) for e in live]
+        self.worst = [(e.score, -e.key, e) for e in live]
+        self.expiries = [(e.expiry_date, e.key, e) for e in live]
+        for heap in (self.best, self.worst, self.expiries):
+            heapq.heapify(heap)
+
+    def _is_live(self, entry, key):
+        live = self.entries.get(entry.symbol)
+        return live is entry and live.key == key
+
+    def _pop_live(self, heap):
+        while heap:
+            item = heapq.heappop(heap)
+            entry = item[2]
+            key = item[1] if heap is not self.worst else -item[1]
+            if self._is_live(entry, key):
+                return entry
+        return None
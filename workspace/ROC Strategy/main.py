@@ -1,8 +1,17 @@
 from AlgorithmImports import *
+import math
 from symbol_data import SymbolData
+from roc_scanner import ROCReboundScanner
+from retention_cache import SymbolDataRetentionCache
+from entry_queue import EntryQueue
 from utils import get_market_cap_thresholds, get_sector_name_to_code
 from ETFConstituentsUniverseSelectionModel import ETFConstituentsUniverseSelectionModel
-from logger import LoggerMixin
+from talib.logger import LoggerMixin
+from talib.screening import FundamentalScreen
+from talib.charting import ChartDecimator
+from talib.recorder import SignalRecorder
+from talib.portfolio_state import PortfolioStateCache
+from talib.brackets import BracketManager
 
 class ROCReboundStrategy(QCAlgorithm):
     def Initialize(self):
@@ -11,7 +20,7 @@ class ROCReboundStrategy(QCAlgorithm):
         self.set_end_date(2025, 1, 1)
         self.set_cash(100000)
 
-        self.logger = LoggerMixin(self)
+        self.logger = LoggerMixin(self, level=self.get_parameter("log_level") or "debug")
         self.logger.log("Logger initialized", level="debug")
 
         # Add SPY as the benchmark
@@ -21,10 +30,18 @@ class ROCReboundStrategy(QCAlgorithm):
         # Add VIX data
         self.vix = self.add_data(CBOE, "VIX", Resolution.DAILY).Symbol
 
-        # Create a custom chart
+        # Create a custom chart, decimated to a bounded number of points per series
+        chart_mode = self.get_parameter("chart_mode") or "last"  # Options: "last", "ohlc", "minmax" or "lttb"
+        self.charts = ChartDecimator(self, int(self.get_parameter("chart_max_points") or 2000), mode=chart_mode)
         vix_chart = Chart("VIX Chart")
         self.add_chart(vix_chart)
-        vix_chart.add_series(Series("VIX Close", SeriesType.LINE))
+        if chart_mode == "ohlc":
+            vix_chart.add_series(CandlestickSeries("VIX Close"))
+        elif chart_mode == "minmax":
+            vix_chart.add_series(Series("VIX Close Min", SeriesType.LINE))
+            vix_chart.add_series(Series("VIX Close Max", SeriesType.LINE))
+        else:
+            vix_chart.add_series(Series("VIX Close", SeriesType.LINE))
         
         # Retrieve parameters
         cap_tiers_param = self.get_parameter("capTiers") or "micro, small, mid"
@@ -52,43 +69,72 @@ class ROCReboundStrategy(QCAlgorithm):
         self.volatility_scaling_enabled = bool(self.get_parameter("volatility_scaling_enabled") or True)
         self.enable_volume_surge = self.get_parameter("enable_volume_surge") or "true"
         self.allow_position_reduction = bool(self.get_parameter("allow_position_reduction") or False)
+        self.scanner_mode = self.get_parameter("scanner_mode") or "loop"  # Options: "loop" or "vectorized"
+        self.retention_days = int(self.get_parameter("retention_days") or 0)  # 0 disables the retention cache
+        self.retention_max_size = int(self.get_parameter("retention_max_size") or 500)
+        self.signal_ttl_days = int(self.get_parameter("signal_ttl_days") or 5)
+        self.max_pending_entries = int(self.get_parameter("max_pending_entries") or 200)
+        self.signal_recorder = self.get_parameter("signal_recorder") or ""  # object store key, empty disables recording
 
         # Log parameters
-        self.logger.log(f"Parameter: capTiers = {cap_tiers_param}", level="debug")
-        self.logger.log(f"Parameter: sectorTiers = {sector_tiers_param}", level="debug")
-        self.logger.log(f"Parameter: volumeSurgeThreshold = {self.volume_surge_threshold}", level="debug")
-        self.logger.log(f"Parameter: vixThreshold = {self.vix_threshold}", level="debug")
-        self.logger.log(f"Parameter: rocMin = {self.roc_min}", level="debug")
-        self.logger.log(f"Parameter: rocMax = {self.roc_max}", level="debug")
-        self.logger.log(f"Parameter: roc_lookback: {self.roc_lookback}", level="debug")
-        self.logger.log(f"Parameter: volume_window: {self.volume_window}", level="debug")
-        self.logger.log(f"Parameter: max_holding_days: {self.max_holding_days}", level="debug")
-        self.logger.log(f"Parameter: trade_allocation_pct: {self.trade_allocation_pct}", level="debug")
-        self.logger.log(f"Parameter: max_daily_loss_pct = {self.max_daily_loss_pct}", level="debug")
-        self.logger.log(f"Parameter: universe_mode = {self.universe_mode}", level="debug")
-        self.logger.log(f"Parameter: etf_symbol = {self.etf_symbol}", level="debug")
-        self.logger.log(f"Parameter: max_open_positions_cap = {self.min_open_positions_cap}", level="debug")
-        self.logger.log(f"Parameter: min_open_positions_cap = {self.min_open_positions_cap}", level="debug")
-        self.logger.log(f"Parameter: volatility_scaling_enabled = {self.volatility_scaling_enabled}", level="debug")
-        self.logger.log(f"Parameter: enable_volume_surge = {self.enable_volume_surge}", level="debug")
-        self.logger.log(f"Parameter: allow_position_reduction = {self.allow_position_reduction}", level="debug")
+        self.logger.log("Parameter: capTiers = {}", cap_tiers_param, level="debug")
+        self.logger.log("Parameter: sectorTiers = {}", sector_tiers_param, level="debug")
+        self.logger.log("Parameter: volumeSurgeThreshold = {}", self.volume_surge_threshold, level="debug")
+        self.logger.log("Parameter: vixThreshold = {}", self.vix_threshold, level="debug")
+        self.logger.log("Parameter: rocMin = {}", self.roc_min, level="debug")
+        self.logger.log("Parameter: rocMax = {}", self.roc_max, level="debug")
+        self.logger.log("Parameter: roc_lookback: {}", self.roc_lookback, level="debug")
+        self.logger.log("Parameter: volume_window: {}", self.volume_window, level="debug")
+        self.logger.log("Parameter: max_holding_days: {}", self.max_holding_days, level="debug")
+        self.logger.log("Parameter: trade_allocation_pct: {}", self.trade_allocation_pct, level="debug")
+        self.logger.log("Parameter: max_daily_loss_pct = {}", self.max_daily_loss_pct, level="debug")
+        self.logger.log("Parameter: universe_mode = {}", self.universe_mode, level="debug")
+        self.logger.log("Parameter: etf_symbol = {}", self.etf_symbol, level="debug")
+        self.logger.log("Parameter: max_open_positions_cap = {}", self.min_open_positions_cap, level="debug")
+        self.logger.log("Parameter: min_open_positions_cap = {}", self.min_open_positions_cap, level="debug")
+        self.logger.log("Parameter: volatility_scaling_enabled = {}", self.volatility_scaling_enabled, level="debug")
+        self.logger.log("Parameter: enable_volume_surge = {}", self.enable_volume_surge, level="debug")
+        self.logger.log("Parameter: allow_position_reduction = {}", self.allow_position_reduction, level="debug")
+        self.logger.log("Parameter: scanner_mode = {}", self.scanner_mode, level="debug")
+        self.logger.log("Parameter: retention_days = {}", self.retention_days, level="debug")
+        self.logger.log("Parameter: retention_max_size = {}", self.retention_max_size, level="debug")
+        self.logger.log("Parameter: signal_ttl_days = {}", self.signal_ttl_days, level="debug")
+        self.logger.log("Parameter: max_pending_entries = {}", self.max_pending_entries, level="debug")
+        self.logger.log("Parameter: signal_recorder = {}", self.signal_recorder, level="debug")
 
         # Load market cap thresholds and sector codes from utils
         self.market_cap_thresholds = get_market_cap_thresholds()
         sector_name_to_code = get_sector_name_to_code()
         self.sector_codes = [sector_name_to_code[name] for name in self.sector_tiers if name in sector_name_to_code]
+        self.fundamental_screen = FundamentalScreen.from_tiers(self.cap_tiers, self.market_cap_thresholds, self.sector_codes)
        
         # Universe related matters
         self.universe_settings.resolution = Resolution.DAILY
         if self.universe_mode == "etf":
-            self.AddUniverseSelection(ETFConstituentsUniverseSelectionModel(self.etf_symbol, self.universe_settings, self._etf_constituents_filter))
+            self.etf_universe_model = ETFConstituentsUniverseSelectionModel(self.etf_symbol, self.universe_settings, top_n=10000)
+            self.AddUniverseSelection(self.etf_universe_model)
         else:
             self.add_universe(self.CoarseSelectionFunction, self.FineSelectionFunction)
 
         self.symbol_data = {}
-        self.to_buy = {}  # {symbol: signal_date}
-        self.open_positions = {}  # {symbol: {entry, target, stop, entry_date}}
+        self.to_buy = EntryQueue(self.max_pending_entries, self.signal_ttl_days)  # pending entries ranked by signal strength
+        self.open_positions = BracketManager(self)  # resting ATR stop and target per position, expiring after max_holding_days
+        self.portfolio_state = PortfolioStateCache(self)  # holdings from fills, reconciled daily
         self.etf_constituents = set()
+        self.scanner = ROCReboundScanner(self.roc_lookback, self.volume_window) if self.scanner_mode == "vectorized" else None
+        self.retention_cache = None
+        if self.retention_days > 0:
+            self.retention_cache = SymbolDataRetentionCache(self.retention_days, self.retention_max_size, self._release_symbol_data)
+
+        # Opt-in per-bar snapshot of the scan features of every evaluated symbol
+        self.recorder = None
+        if self.signal_recorder:
+            self.recorder = SignalRecorder(self.object_store.get_file_path(self.signal_recorder), [
+                ("roc_today", "f4"), ("roc_yesterday", "f4"), ("roc_3days_ago", "f4"), ("volume_ratio", "f4"),
+                ("deep_drop", "?"), ("rebound", "?"), ("volume_surge", "?"), ("signal", "?"), ("queued", "?"),
+            ])
+            if self.scanner:
+                self.scanner.keep_features = True
 
         # Variables to track daily loss
         self.starting_portfolio_value = self.Portfolio.TotalPortfolioValue
@@ -105,69 +151,76 @@ class ROCReboundStrategy(QCAlgorithm):
         return [x.Symbol for x in coarse if x.HasFundamentalData]
 
     def FineSelectionFunction(self, fine):
-        selected = []
-        for stock in fine:
-            # Market cap filter
-            market_cap = stock.MarketCap
-            cap_match = any(
-                self.market_cap_thresholds[tier][0] <= market_cap <= self.market_cap_thresholds[tier][1]
-                for tier in self.cap_tiers
-            )
-
-            # Sector filter using MorningstarSectorCode
-            sector_code = stock.AssetClassification.MorningstarSectorCode
-            sector_match = sector_code in self.sector_codes
-
-            if cap_match and sector_match:
-                selected.append(stock.Symbol)
-
-        return selected
-
-    def _etf_constituents_filter(self, constituents: list[ETFConstituentUniverse]) -> list[Symbol]:
-        # Select the 10 largest Equities in the ETF.
-        selected = sorted(
-            [c for c in constituents if c.weight],
-            key=lambda c: c.weight, reverse=True
-        )[:10000]
-        return [c.symbol for c in selected]
+        # Market cap tiers and MorningstarSectorCode, compiled once in Initialize
+        return self.fundamental_screen.select(fine)
 
     def OnSecuritiesChanged(self, changes):
+        if self.retention_cache:
+            self.retention_cache.expire(self.time.date())
+
         for security in changes.AddedSecurities:
             symbol = security.Symbol
             if self.universe_mode == "etf":
                 self.etf_constituents.add(symbol)
 
             if symbol not in self.symbol_data:
-                self.symbol_data[symbol] = SymbolData(self, symbol, self.roc_lookback, self.volume_window)
+                symbol_data = self.retention_cache.reattach(symbol, self.time.date()) if self.retention_cache else None
+                if symbol_data is not None:
+                    # Warm state from a recent membership: catch up on the bars missed while parked, resume feeding its ATR
+                    if self.scanner:
+                        self.scanner.resume(symbol)
+                    self._backfill(symbol, symbol_data)
+                    self.register_indicator(symbol, symbol_data.atr, Resolution.DAILY)
+                else:
+                    symbol_data = SymbolData(self, symbol, self.roc_lookback, self.volume_window)
+                    if self.scanner:
+                        self.scanner.add(symbol)
+                self.symbol_data[symbol] = symbol_data
 
         for security in changes.RemovedSecurities:
             symbol = security.Symbol
             if symbol in self.symbol_data:
-                del self.symbol_data[symbol]
-            if symbol in self.open_positions:
-                self.Liquidate(symbol)
-                self.open_positions.pop(symbol)
+                symbol_data = self.symbol_data.pop(symbol)
+                if self.retention_cache:
+                    self.deregister_indicator(symbol_data.atr)
+                    last_data = security.get_last_data()
+                    symbol_data.last_time = last_data.end_time if last_data is not None else self.time
+                    if self.scanner:
+                        self.scanner.suspend(symbol)
+                    self.retention_cache.park(symbol, symbol_data, self.time.date())
+                elif self.scanner:
+                    self.scanner.remove(symbol)
+            self.to_buy.discard(symbol)
+            self.open_positions.close(symbol)
             if self.universe_mode == "etf" and symbol in self.etf_constituents:
                 self.etf_constituents.remove(symbol)
 
+    def _backfill(self, symbol, symbol_data):
+        # One request for the daily bars a reattached symbol missed, so ROCs and the ATR's true range
+        # are not measured across the gap
+        if symbol_data.last_time is None:
+            return
+        for bar in self.history[TradeBar](symbol, symbol_data.last_time, self.time, Resolution.DAILY):
+            if bar.end_time <= symbol_data.last_time:
+                continue
+            symbol_data.atr.update(bar)
+            if self.scanner:
+                self.scanner.update({symbol: bar})
+            else:
+                symbol_data.update(bar)
+            symbol_data.last_time = bar.end_time
+
+    def _release_symbol_data(self, symbol, symbol_data):
+        # Called by the retention cache when a parked symbol expires or is evicted
+        if self.scanner:
+            self.scanner.remove(symbol)
+
     def OnData(self, data):
         if self.is_warming_up:    
             return
 
-        # Manage trade exits
-        for symbol, pos in list(self.open_positions.items()):
-            price = self.securities[symbol].price
-            target = pos["target"]
-            stop = pos["stop"]
-
-            if price >= target or price <= stop:
-                self.liquidate(symbol)
-                self.open_positions.pop(symbol)
-            else:
-                holding_days = (self.time.date() - pos["entry_date"]).days
-                if holding_days > self.max_holding_days:
-                    self.liquidate(symbol)
-                    self.open_positions.pop(symbol)
+        # Targets and stops rest as orders; only holdings past max_holding_days are closed here
+        self.open_positions.expire(self.time)
 
         # Check if trading is halted for the day
         if self.trading_halted_today:
@@ -180,6 +233,9 @@ class ROCReboundStrategy(QCAlgorithm):
 
         # If loss exceeds maximum allowed, liquidate and halt trading
         if loss_pct >= self.max_daily_loss_pct:
+            # Brackets first so their resting legs are canceled, then anything held outside them
+            for symbol in list(self.open_positions.brackets):
+                self.open_positions.close(symbol, tag="Daily loss halt")
             self.Liquidate()
             self.trading_halted_today = True
             #self.Debug(f"Maximum daily loss exceeded: {loss_pct:.2%}. Trading halted for the day.")
@@ -188,14 +244,65 @@ class ROCReboundStrategy(QCAlgorithm):
         # Check VIX level
         if self.vix in data and data[self.vix] is not None:
             current_vix = data[self.vix].Close            
-            self.plot("VIX Chart", "VIX Close", current_vix)
+            self.charts.plot("VIX Chart", "VIX Close", current_vix)
             if current_vix > self.vix_threshold:                
                 return  # Skip trading in high volatility
 
+        if self.scanner:
+            self.scan_vectorized(data)
+        else:
+            self.scan_loop(data)
+
+        # Release the strongest pending entries into the free position slots
+        today = self.time.date()
+        self.to_buy.expire(today)
+        deferred = []
+        # open() registers the bracket on submission, so an entry counts once against the free slots
+        # whether its market order filled synchronously or is still pending
+        while len(self.open_positions) < self.max_open_positions:
+            entry = self.to_buy.pop_best(today)
+            if entry is None:
+                break
+            symbol = entry.symbol
+
+            if symbol in self.portfolio_state or not self.securities[symbol].is_tradable:
+                deferred.append(entry)
+                continue
+
+            price = self.securities[symbol].price
+            if price is None or price <= 0:
+                continue
+
+            symbol_data = self.symbol_data.get(symbol)
+            if symbol_data is None or not symbol_data.atr.is_ready:
+                continue
+
+            # Ask the margin model how much buying power is available
+            quantity = self.CalculateOrderQuantity(symbol, self.trade_allocation_pct)
+
+            if quantity <= 0:
+                #self.logger.log(f"Skipping {symbol.Value}: insufficient buying power {price:.2f})", level="debug")
+                continue
+
+            atr_val = symbol_data.atr.current.value
+            try:
+                self.open_positions.open(symbol, quantity,
+                                         stop_distance=self.atr_stop_loss_multiplier * atr_val,
+                                         target_distance=self.atr_take_profit_multiplier * atr_val,
+                                         # Held too long once (date - entry_date).days > max_holding_days
+                                         expiry=datetime.combine(today + timedelta(days=self.max_holding_days + 1), datetime.min.time()))
+            except Exception as e:
+                self.logger.log("Order failed for {}: {}", symbol.Value, e)
+
+        for entry in deferred:
+            self.to_buy.requeue(entry)
+
+    def scan_loop(self, data):
         for symbol, symbol_data in self.symbol_data.items():
             if symbol in data and data[symbol] is not None:
                 symbol_data.update(data[symbol])
 
+        snapshot = [] if self.recorder else None
         for symbol, symbol_data in self.symbol_data.items():
             if symbol_data.is_ready():
                 roc_today = symbol_data.roc_today()
@@ -208,76 +315,65 @@ class ROCReboundStrategy(QCAlgorithm):
                 deep_drop = self.roc_min <= roc_today <= self.roc_max
 
                 # Apply Volume surge filter                
-                volume_surge = not self.enable_volume_surge or current_volume >= self.volume_surge_threshold * avg_volume
+                volume_surge = current_volume >= self.volume_surge_threshold * avg_volume
+                rebound = roc_today > roc_3days_ago and roc_today > roc_yesterday
+                signal = deep_drop and rebound and (not self.enable_volume_surge or volume_surge)
+                volume_ratio = current_volume / avg_volume if avg_volume > 0 else 0
 
                 # ROC Strategy!
-                if deep_drop and roc_today > roc_3days_ago and roc_today > roc_yesterday and volume_surge:
-                    if not self.portfolio[symbol].invested and symbol not in self.to_buy and symbol not in self.open_positions:
-                        self.to_buy[symbol] = self.time.date()
-
-        for symbol, signal_date in list(self.to_buy.items()):
-            if self.time.date() <= signal_date:
+                queued = False
+                if signal:
+                    if symbol not in self.portfolio_state and symbol not in self.to_buy and symbol not in self.open_positions:
+                        score = self._signal_strength(symbol_data, roc_today, volume_ratio, symbol_data.price_change())
+                        self.to_buy.push(symbol, score, self.time.date())
+                        queued = True
+
+                if snapshot is not None:
+                    snapshot.append((symbol, roc_today, roc_yesterday, roc_3days_ago, volume_ratio,
+                                     deep_drop, rebound, volume_surge, signal, queued))
+
+        if snapshot:
+            symbols, *columns = zip(*snapshot)
+            names = ("roc_today", "roc_yesterday", "roc_3days_ago", "volume_ratio",
+                     "deep_drop", "rebound", "volume_surge", "signal", "queued")
+            self.recorder.append(self.time, symbols, **dict(zip(names, columns)))
+
+    def scan_vectorized(self, data):
+        # Same conditions as scan_loop, evaluated for the whole universe at once
+        self.scanner.update(data.Bars)
+        candidates = self.scanner.scan(self.roc_min, self.roc_max, self.volume_surge_threshold, bool(self.enable_volume_surge))
+
+        queued = set()
+        for symbol in candidates:
+            symbol_data = self.symbol_data[symbol]
+            if not symbol_data.atr.is_ready:
                 continue
-
-            if (not self.portfolio[symbol].invested and 
-                self.securities[symbol].is_tradable and 
-                len(self.open_positions) < self.max_open_positions):
-                                
-                price = self.securities[symbol].price
-                if price is None or price <= 0:
-                    self.to_buy.pop(symbol)
-                    continue
-
-                # Ask the margin model how much buying power is available                
-                price = self.Securities[symbol].Price
-                quantity = self.CalculateOrderQuantity(symbol, self.trade_allocation_pct)               
-
-                if quantity <= 0:
-                    #self.logger.log(f"Skipping {symbol.Value}: insufficient buying power {price:.2f})", level="debug")
-                    self.to_buy.pop(symbol)
-                    continue
-
-                try:
-                    self.market_order(symbol, quantity)
-                except Exception as e:
-                    self.logger.log(f"Order failed for {symbol.Value}: {e}")
-                finally:
-                    self.to_buy.pop(symbol)
-            else:
-                if len(self.open_positions) >= self.max_open_positions:
-                    #self.logger.log(f"Max open positions reached. Skipping {symbol}", level="debug")
-                    continue
+            if symbol not in self.portfolio_state and symbol not in self.to_buy and symbol not in self.open_positions:
+                score = self._signal_strength(symbol_data, *self.scanner.signal_features(symbol))
+                self.to_buy.push(symbol, score, self.time.date())
+                queued.add(symbol)
+
+        features = self.scanner.features
+        if self.recorder and features:
+            symbols = features.pop("symbols")
+            features["queued"] = [symbol in queued for symbol in symbols]
+            self.recorder.append(self.time, symbols, **features)
+
+    def _signal_strength(self, symbol_data, roc_today, volume_ratio, price_change):
+        # Rank pending entries: depth of the drop within [rocMin, rocMax], log volume surge ratio,
+        # and the size of the fall measured in stop-loss widths (ATR * atr_stop_loss_multiplier)
+        roc_range = (self.roc_max - self.roc_min) or 1
+        depth = (self.roc_max - roc_today) / roc_range
+        surge = math.log(volume_ratio) if volume_ratio > 0 else 0
+        stop_width = symbol_data.atr.current.value * self.atr_stop_loss_multiplier
+        atr_distance = -price_change / stop_width if stop_width > 0 else 0
+        return depth + surge + atr_distance
 
 
     def OnOrderEvent(self, order_event: OrderEvent):
-        if order_event.status != OrderStatus.FILLED:
-            return
-
-        symbol = order_event.symbol
-        if order_event.direction != OrderDirection.BUY:
-            return
-
-        price = order_event.fill_price
-
-        # Safe access
-        if symbol not in self.symbol_data:
-            self.logger.log(f"OrderEvent received for unknown symbol: {symbol}", level="debug")
-            return
-
-        atr = self.symbol_data[symbol].atr
-        if not atr.IsReady:
-            return
-
-        atr_val = atr.Current.Value
-        target = price + self.atr_take_profit_multiplier * atr_val
-        stop = price - self.atr_stop_loss_multiplier * atr_val
-    
-        self.open_positions[symbol] = {
-            "entry": price,
-            "target": target,
-            "stop": stop,
-            "entry_date": self.time.date()
-        }
+        self.portfolio_state.on_order_event(order_event)
+        # Places the stop and target once an entry fills, and cancels the other leg when one does
+        self.open_positions.on_order_event(order_event)
 
     def ResetDailyLossTracking(self):
         self.starting_portfolio_value = self.Portfolio.TotalPortfolioValue
@@ -285,6 +381,24 @@ class ROCReboundStrategy(QCAlgorithm):
 
     def OnEndOfAlgorithm(self):
         self.liquidate()
+        self.charts.flush()
+        if self.universe_mode == "etf":
+            model = self.etf_universe_model
+            self.logger.log("ETF universe: {}/{} selections unchanged", model.unchanged_selections, model.selections, level="info")
+        if self.retention_cache:
+            cache = self.retention_cache
+            self.logger.log("Retention cache: {} reattached, {} cold starts, {} expired, {} evicted",
+                            cache.hits, cache.misses, cache.expirations, cache.evictions, level="info")
+        brackets = self.open_positions
+        self.logger.log("Brackets: {} opened, {} stopped, {} targeted, {} expired, {} closed, {} closed outside", brackets.opened,
+                        brackets.stopped, brackets.targeted, brackets.expired, brackets.closed, brackets.flattened, level="info")
+        self.logger.log("Portfolio state: {} fills, {} reconciliations, {} drift corrections", self.portfolio_state.fills,
+                        self.portfolio_state.reconciliations, self.portfolio_state.drift_corrections, level="info")
+        if self.recorder:
+            self.recorder.close()
+            self.logger.log("Signal recorder: {} rows in {} bars, {:.1f} us per bar", self.recorder.rows,
+                            self.recorder.appends, 1e6 * self.recorder.seconds / max(self.recorder.appends, 1), level="info")
+        self.logger.report()
 
     # Track when remaining margin is low.
     def on_margin_call_warning(self) -> None:
@@ -292,11 +406,12 @@ class ROCReboundStrategy(QCAlgorithm):
         
         # Optional: start liquidating smallest winners or highest-risk trades
         sorted_by_risk = sorted(
-            self.open_positions.items(),
-            key=lambda kv: abs(self.Securities[kv[0]].Price - kv[1]['stop'])  # closeness to stop
+            ((symbol, bracket) for symbol, bracket in self.open_positions.items()
+             if symbol in self.portfolio_state and bracket.stop_price is not None),
+            key=lambda kv: abs(self.Securities[kv[0]].Price - kv[1].stop_price)  # closeness to stop
         )
         for symbol, _ in sorted_by_risk[:3]:  # Just an example: close top 3 risky positions
-            self.Liquidate(symbol)
+            self.open_positions.close(symbol)
             #self.logger.log(f"Preemptively liquidated {symbol.Value} due to margin risk.")
 
 
@@ -313,6 +428,7 @@ class ROCReboundStrategy(QCAlgorithm):
         return losing_requests
 
     def RebalanceMaxOpenPositions(self):
+        self.portfolio_state.maybe_reconcile()
         margin_pct = self.Portfolio.MarginRemaining / self.Portfolio.TotalPortfolioValue if self.Portfolio.TotalPortfolioValue > 0 else 0
 
         # Base scaling: more margin → more allowed positions
@@ -342,27 +458,9 @@ class ROCReboundStrategy(QCAlgorithm):
             # Close least profitable positions first
             sorted_positions = sorted(
                 self.open_positions.items(),
-                key=lambda kv: self.Portfolio[kv[0]].UnrealizedProfit
+                key=lambda kv: self.portfolio_state.unrealized_profit(kv[0], self.Securities[kv[0]].Price)
             )
 
-<<<<<<< HEAD
-    def custom_log(self, message, level="info"):
-        """
-        Custom logging method to handle different log levels.
-        Levels: 'debug', 'info', 'error'
-        """
-        if level == "debug":
-            self.debug(message)
-        elif level == "info":
-            self.log(message)
-        elif level == "error":
-            self.error(message)
-        else:
-            self.log(message)  # Default to info level
-
-=======
             for symbol, _ in sorted_positions[:excess]:
-                self.Liquidate(symbol)
+                self.open_positions.close(symbol)
                 #self.logger.log(f"Force-closed {symbol.Value} to reduce open positions.", level="info")
-                self.open_positions.pop(symbol)
->>>>>>> 669bce4b586142a48a0a899557818c7be59efdea
@@ -0,0 +1,68 @@
+# region imports
+from AlgorithmImports import *
+# endregion
+from collections import OrderedDict
+
+class SymbolDataRetentionCache:
+    '''Parks the SymbolData of symbols that left the universe so it can be reattached on re-entry.
+
+    Entries older than ttl_days are expired and the least recently parked entries are evicted
+    once more than max_size are held. on_evict(symbol, symbol_data) is called for every entry
+    that is dropped without being reattached.'''
+
+    def __init__(self, ttl_days, max_size, on_evict=None):
+        self.ttl_days = ttl_days
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self.entries = OrderedDict()  # {symbol: (parked_date, symbol_data)}, oldest first
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, symbol):
+        return symbol in self.entries
+
+    def park(self, symbol, symbol_data, date):
+        self.entries.pop(symbol, None)
+        self.entries[symbol] = (date, symbol_data)
+
+        while len(self.entries) > self.max_size:
+            evicted_symbol, (_, evicted) = self.entries.popitem(last=False)
+            self.evictions += 1
+            self._drop(evicted_symbol, evicted)
+
+    def reattach(self, symbol, date):
+        '''Returns the parked SymbolData for symbol, or None if it was never parked or has expired.'''
+        entry = self.entries.pop(symbol, None)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        parked_date, symbol_data = entry
+        if (date - parked_date).days > self.ttl_days:
+            self.expirations += 1
+            self.misses += 1
+            self._drop(symbol, symbol_data)
+            return None
+
+        self.hits += 1
+        return symbol_data
+
+    def expire(self, date):
+        # Entries are kept in park order, so the expired ones are always at the front
+        while self.entries:
+            symbol, (parked_date, symbol_data) = next(iter(self.entries.items()))
+            if (date - parked_date).days <= self.ttl_days:
+                break
+            self.entries.popitem(last=False)
+            self.expirations += 1
+            self._drop(symbol, symbol_data)
+
+    def _drop(self, symbol, symbol_data):
+        if self.on_evict:
+            self.on_evict(symbol, symbol_data)
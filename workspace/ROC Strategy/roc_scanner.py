@@ -0,0 +1,157 @@
+# region imports
+from AlgorithmImports import *
+# endregion
+import numpy as np
+
+class ROCReboundScanner:
+    '''Cross-sectional ROC rebound scanner.
+
+    Keeps the close and volume history of the whole universe in two NumPy panels
+    (one row per symbol, used as per-row ring buffers) so the deep-drop, ROC-improving
+    and volume-surge conditions can be evaluated for every symbol in one vectorized pass.
+    The windows mirror SymbolData: roc_lookback + 5 closes and volume_window volumes.'''
+
+    def __init__(self, roc_lookback, volume_window, capacity=256):
+        self.roc_lookback = roc_lookback
+        self.close_length = roc_lookback + 5
+        self.volume_window = volume_window
+        self.ready_samples = max(self.close_length, self.volume_window)
+
+        self.closes = np.zeros((capacity, self.close_length))
+        self.volumes = np.zeros((capacity, self.volume_window))
+        self.samples = np.zeros(capacity, dtype=np.int64)   # bars written per row
+        self.sequence = np.zeros(capacity, dtype=np.int64)  # add order, keeps to_buy order stable
+        self.active = np.zeros(capacity, dtype=bool)        # False for free or suspended rows
+        self.symbols = [None] * capacity
+        self.rows = {}  # {symbol: row}
+        self.free_rows = list(range(capacity - 1, -1, -1))
+        self.next_sequence = 0
+
+        # When set, scan() keeps the features of every evaluated symbol in self.features
+        self.keep_features = False
+        self.features = None
+
+    def add(self, symbol):
+        if symbol in self.rows:
+            return
+        if not self.free_rows:
+            self._grow()
+        row = self.free_rows.pop()
+        self.rows[symbol] = row
+        self.symbols[row] = symbol
+        self.samples[row] = 0
+        self.sequence[row] = self.next_sequence
+        self.active[row] = True
+        self.next_sequence += 1
+
+    def remove(self, symbol):
+        row = self.rows.pop(symbol, None)
+        if row is None:
+            return
+        self.symbols[row] = None
+        self.samples[row] = 0
+        self.active[row] = False
+        self.free_rows.append(row)
+
+    def suspend(self, symbol):
+        '''Keeps the symbol's history but excludes it from scans until resumed.'''
+        row = self.rows.get(symbol)
+        if row is not None:
+            self.active[row] = False
+
+    def resume(self, symbol):
+        row = self.rows.get(symbol)
+        if row is None:
+            self.add(symbol)
+            return
+        self.active[row] = True
+        self.sequence[row] = self.next_sequence
+        self.next_sequence += 1
+
+    def update(self, bars):
+        '''Writes the latest close/volume of every tracked symbol present in bars in one step.'''
+        rows, closes, volumes = [], [], []
+        for symbol, bar in bars.items():
+            row = self.rows.get(symbol)
+            if row is None or bar is None:
+                continue
+            rows.append(row)
+            closes.append(bar.Close)
+            volumes.append(bar.Volume)
+        if not rows:
+            return
+
+        rows = np.asarray(rows, dtype=np.int64)
+        samples = self.samples[rows]
+        self.closes[rows, samples % self.close_length] = closes
+        self.volumes[rows, samples % self.volume_window] = volumes
+        self.samples[rows] = samples + 1
+
+    def scan(self, roc_min, roc_max, volume_surge_threshold, apply_volume_surge=True):
+        '''Returns the symbols meeting the rebound conditions, in the order they were added.'''
+        rows = np.flatnonzero(self.active & (self.samples >= self.ready_samples))
+        self.features = None
+        if rows.size == 0:
+            return []
+
+        samples = self.samples[rows]
+        lookback = self.roc_lookback
+
+        def close(lag):
+            return self.closes[rows, (samples - 1 - lag) % self.close_length]
+
+        def roc(lag):
+            past = close(lag + lookback)
+            return ((close(lag) - past) / past) * 100
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            roc_today = roc(0)
+            roc_yesterday = roc(1)
+            roc_3days_ago = roc(3)
+
+        deep_drop = (roc_min <= roc_today) & (roc_today <= roc_max)
+        rebound = (roc_today > roc_3days_ago) & (roc_today > roc_yesterday)
+        signal = deep_drop & rebound
+
+        if apply_volume_surge or self.keep_features:
+            average_volume = self.volumes[rows].sum(axis=1) / self.volume_window
+            current_volume = self.volumes[rows, (samples - 1) % self.volume_window]
+            volume_surge = current_volume >= volume_surge_threshold * average_volume
+            if apply_volume_surge:
+                signal &= volume_surge
+
+        if self.keep_features:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                volume_ratio = np.where(average_volume > 0, current_volume / average_volume, 0.0)
+            self.features = {
+                "symbols": [self.symbols[row] for row in rows],
+                "roc_today": roc_today, "roc_yesterday": roc_yesterday, "roc_3days_ago": roc_3days_ago,
+                "volume_ratio": volume_ratio, "deep_drop": deep_drop, "rebound": rebound,
+                "volume_surge": volume_surge, "signal": signal,
+            }
+
+        hits = rows[signal]
+        hits = hits[np.argsort(self.sequence[hits], kind="stable")]
+        return [self.symbols[row] for row in hits]
+
+    def signal_features(self, symbol):
+        '''Returns (roc_today, volume_ratio, price_change) for a single ready symbol.'''
+        row = self.rows[symbol]
+        samples = self.samples[row]
+        close = self.closes[row, (samples - 1) % self.close_length]
+        past = self.closes[row, (samples - 1 - self.roc_lookback) % self.close_length]
+        average_volume = self.volumes[row].sum() / self.volume_window
+        current_volume = self.volumes[row, (samples - 1) % self.volume_window]
+        volume_ratio = current_volume / average_volume if average_volume > 0 else 0.0
+        return float((close - past) / past * 100), float(volume_ratio), float(close - past)
+
+    def _grow(self):
+        capacity = len(self.symbols)
+        extra = capacity or 1
+        self.closes = np.vstack([self.closes, np.zeros((extra, self.close_length))])
+        self.volumes = np.vstack([self.volumes, np.zeros((extra, self.volume_window))])
+        self.samples = np.concatenate([self.samples, np.zeros(extra, dtype=np.int64)])
+        self.sequence = np.concatenate([self.sequence, np.zeros(extra, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+        self.symbols.extend([None] * extra)
+        self.free_rows.extend(range(capacity + extra - 1, capacity - 1, -1))
@@ -0,0 +1,203 @@
+'''Feature-cached parameter sweep for ROCReboundStrategy.
+
+rocMin, rocMax, volumeSurgeThreshold, vixThreshold, the ATR multipliers and max_holding_days only
+change thresholds applied to the same ROC, volume and ATR series. build_features computes those
+series once for a universe and date range (e.g. from a QuantBook History frame in research.ipynb),
+save_features caches them as a compressed .npz and run_sweep evaluates a parameter grid against the
+cache in a process pool, returning a ranked DataFrame.
+
+Trades are evaluated independently of each other: position capacity, allocation and overlapping
+signals on the same symbol are ignored. Use the ranking to prune the grid, then confirm the best
+points with a Lean backtest.
+
+    python roc_sweep.py storage/roc_features_<key>.npz --out sweep.csv --processes 8
+'''
+import argparse
+import hashlib
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+SIGNAL_PARAMETERS = ("rocMin", "rocMax", "volumeSurgeThreshold", "vixThreshold")
+EXIT_PARAMETERS = ("atr_stop_loss_multiplier", "atr_take_profit_multiplier", "max_holding_days")
+
+DEFAULT_GRID = {
+    "rocMin": [-40, -30, -25],
+    "rocMax": [-20, -15, -10],
+    "volumeSurgeThreshold": [0.5, 1.0, 1.5, 2.0],
+    "vixThreshold": [20, 25, 30, 1000],
+    "atr_stop_loss_multiplier": [1.5, 2.0, 2.5, 3.0],
+    "atr_take_profit_multiplier": [0.5, 1.0, 1.5, 2.0],
+    "max_holding_days": [5, 10, 15, 20],
+}
+
+def feature_key(symbols, start, end, roc_lookback, volume_window, atr_period):
+    '''Stable cache key for a universe, date range and set of lookbacks.'''
+    text = "|".join([",".join(sorted(str(s) for s in symbols)), str(start), str(end),
+                     str(roc_lookback), str(volume_window), str(atr_period)])
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+def build_features(history, vix=None, roc_lookback=14, volume_window=14, atr_period=14):
+    '''Builds the (dates x symbols) feature panels from a daily OHLCV history frame indexed by (symbol, time).
+
+    Windows match SymbolData: ROC is only defined once roc_lookback + 5 closes are available, the
+    average volume is a simple volume_window mean and ATR is a simple atr_period mean of true range.'''
+    close = history["close"].unstack(level=0).sort_index()
+    high = history["high"].unstack(level=0).reindex_like(close)
+    low = history["low"].unstack(level=0).reindex_like(close)
+    volume = history["volume"].unstack(level=0).reindex_like(close)
+
+    past = close.shift(roc_lookback)
+    roc = ((close - past) / past) * 100
+    roc_ready = close.notna().rolling(roc_lookback + 5).sum() == roc_lookback + 5
+    roc = roc.where(roc_ready)
+
+    average_volume = volume.rolling(volume_window).mean()
+
+    previous_close = close.shift(1)
+    true_range = np.maximum(high - low, np.maximum((high - previous_close).abs(), (low - previous_close).abs()))
+    atr = true_range.rolling(atr_period).mean()
+
+    if vix is None:
+        vix_values = np.zeros(len(close.index))
+    else:
+        vix_values = vix.reindex(close.index).ffill().fillna(0).to_numpy(dtype=float)
+
+    return {
+        "dates": close.index.to_numpy(dtype="datetime64[D]"),
+        "symbols": np.array([str(s) for s in close.columns]),
+        "close": close.to_numpy(dtype=float),
+        "volume": volume.to_numpy(dtype=float),
+        "average_volume": average_volume.to_numpy(dtype=float),
+        "roc": roc.to_numpy(dtype=float),
+        "atr": atr.to_numpy(dtype=float),
+        "vix": vix_values,
+        "roc_lookback": np.array(roc_lookback),
+        "volume_window": np.array(volume_window),
+        "atr_period": np.array(atr_period),
+    }
+
+def save_features(features, directory):
+    key = feature_key(features["symbols"], features["dates"][0], features["dates"][-1],
+                      int(features["roc_lookback"]), int(features["volume_window"]), int(features["atr_period"]))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"roc_features_{key}.npz")
+    np.savez_compressed(path, **features)
+    return path
+
+def load_features(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def _shift(values, periods):
+    shifted = np.full_like(values, np.nan)
+    shifted[periods:] = values[:-periods]
+    return shifted
+
+def _prepare(features):
+    features["roc_yesterday"] = _shift(features["roc"], 1)
+    features["roc_3days_ago"] = _shift(features["roc"], 3)
+    return features
+
+def signal_indices(features, roc_min, roc_max, volume_surge_threshold, vix_threshold):
+    '''(row, column) of every signal bar, i.e. the bars on which OnData would add the symbol to to_buy.'''
+    roc = features["roc"]
+    with np.errstate(invalid="ignore"):
+        signal = (roc_min <= roc) & (roc <= roc_max)
+        signal &= (roc > features["roc_3days_ago"]) & (roc > features["roc_yesterday"])
+        signal &= features["volume"] >= volume_surge_threshold * features["average_volume"]
+        signal &= (features["vix"] <= vix_threshold)[:, None]
+    signal &= np.isfinite(features["atr"])
+    signal[-2:] = False  # need an entry bar and at least one bar after it
+    return np.nonzero(signal)
+
+def trade_returns(features, rows, columns, stop_multiplier, target_multiplier, max_holding_days):
+    '''Return of each signal entered at the next bar's close and exited at the first close through
+    the ATR target or stop, or once held for more than max_holding_days calendar days.'''
+    close, atr, dates = features["close"], features["atr"], features["dates"]
+    entry_rows = rows + 1
+    entry = close[entry_rows, columns]
+    entry_atr = atr[entry_rows, columns]
+
+    horizon = np.arange(1, max_holding_days + 2)
+    path_rows = np.minimum(entry_rows[:, None] + horizon, len(dates) - 1)
+    path = close[path_rows, columns[:, None]]
+    held_days = (dates[path_rows] - dates[entry_rows][:, None]).astype(int)
+
+    with np.errstate(invalid="ignore"):
+        exit_hit = path >= (entry + target_multiplier * entry_atr)[:, None]
+        exit_hit |= path <= (entry - stop_multiplier * entry_atr)[:, None]
+    exit_hit |= held_days > max_holding_days
+    exit_hit[:, -1] = True
+
+    exit_price = path[np.arange(len(rows)), exit_hit.argmax(axis=1)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = exit_price / entry - 1
+    return returns[np.isfinite(returns)]
+
+def summarize(returns):
+    count = len(returns)
+    if count == 0:
+        return {"trades": 0, "win_rate": np.nan, "mean_return": np.nan, "total_return": 0.0,
+                "profit_factor": np.nan, "t_stat": np.nan}
+    gains = returns[returns > 0].sum()
+    losses = -returns[returns < 0].sum()
+    std = returns.std(ddof=1) if count > 1 else 0.0
+    return {
+        "trades": count,
+        "win_rate": float((returns > 0).mean()),
+        "mean_return": float(returns.mean()),
+        "total_return": float(returns.sum()),
+        "profit_factor": float(gains / losses) if losses > 0 else np.inf,
+        "t_stat": float(returns.mean() / std * np.sqrt(count)) if std > 0 else np.nan,
+    }
+
+_features = None
+
+def _init_worker(path):
+    global _features
+    _features = _prepare(load_features(path))
+
+def _evaluate_signal_group(task):
+    signal_params, exit_grid = task
+    rows, columns = signal_indices(_features, *signal_params)
+    results = []
+    for exit_params in exit_grid:
+        returns = trade_returns(_features, rows, columns, *exit_params)
+        result = dict(zip(SIGNAL_PARAMETERS + EXIT_PARAMETERS, signal_params + exit_params))
+        result.update(summarize(returns))
+        results.append(result)
+    return results
+
+def run_sweep(features_path, grid=None, processes=None, rank_by="t_stat", min_trades=20):
+    '''Evaluates every grid point against the cached features and returns them ranked by rank_by.
+
+    Grid points sharing signal thresholds are evaluated in the same task, so each signal mask is
+    computed once and reused for all of its exit settings.'''
+    grid = dict(DEFAULT_GRID, **(grid or {}))
+    signal_grid = [p for p in itertools.product(*(grid[name] for name in SIGNAL_PARAMETERS)) if p[0] <= p[1]]
+    exit_grid = list(itertools.product(*(grid[name] for name in EXIT_PARAMETERS)))
+    tasks = [(signal_params, exit_grid) for signal_params in signal_grid]
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(features_path,)) as pool:
+        results = [row for rows in pool.map(_evaluate_signal_group, tasks) for row in rows]
+
+    table = pd.DataFrame(results)
+    table = table[table["trades"] >= min_trades]
+    return table.sort_values(rank_by, ascending=False, na_position="last").reset_index(drop=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep ROCReboundStrategy thresholds over cached features.")
+    parser.add_argument("features", help="Path to a .npz written by save_features")
+    parser.add_argument("--out", default="roc_sweep.csv")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--rank-by", default="t_stat")
+    parser.add_argument("--min-trades", type=int, default=20)
+    args = parser.parse_args()
+
+    ranked = run_sweep(args.features, processes=args.processes, rank_by=args.rank_by, min_trades=args.min_trades)
+    ranked.to_csv(args.out, index=False)
+    print(ranked.head(20).to_string())
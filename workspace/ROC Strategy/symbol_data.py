@@ -1,36 +1,74 @@
 from AlgorithmImports import *
+from array import array
 
 class SymbolData:
+    '''Per-symbol ROC and volume state held in preallocated float arrays.
+
+    Closes and volumes are ring buffers indexed by the bar count. The volume total is kept as a
+    running sum and each bar's ROC is cached on update, so reading today's, yesterday's or
+    three-days-ago ROC is a lookup instead of a recomputation.'''
+
+    __slots__ = ("symbol", "algorithm", "roc_lookback", "volume_window", "atr",
+                 "closes", "volumes", "rocs", "volume_sum", "samples", "last_time")
+
+    ROC_HISTORY = 4  # today, yesterday, 2 and 3 days ago
+
     def __init__(self, algorithm, symbol, roc_lookback, volume_window):
         self.symbol = symbol
         self.algorithm = algorithm
         self.roc_lookback = roc_lookback
         self.volume_window = volume_window
-        self.roc_window = RollingWindow[float](roc_lookback + 5)
-        self.volume_window_data = RollingWindow[float](volume_window)
+        self.closes = array('d', [0.0]) * (roc_lookback + 1)
+        self.volumes = array('d', [0.0]) * volume_window
+        self.rocs = array('d', [0.0]) * self.ROC_HISTORY
+        self.volume_sum = 0.0
+        self.samples = 0
+        self.last_time = None  # end time of the last bar seen, set when parked in the retention cache
         self.atr = algorithm.ATR(symbol, 14, MovingAverageType.SIMPLE, Resolution.DAILY)
 
     def update(self, bar):
-        self.roc_window.add(bar.Close)
-        self.volume_window_data.add(bar.Volume)
+        samples = self.samples
+        close = float(bar.Close)
+        volume = float(bar.Volume)
+
+        closes = self.closes
+        closes[samples % len(closes)] = close
+        if samples >= self.roc_lookback:
+            past = closes[(samples - self.roc_lookback) % len(closes)]
+            self.rocs[samples % self.ROC_HISTORY] = ((close - past) / past) * 100 if past else float('nan')
+
+        volumes = self.volumes
+        slot = samples % len(volumes)
+        self.volume_sum += volume - volumes[slot]
+        volumes[slot] = volume
+        if slot == len(volumes) - 1:
+            # Resync once per window so the running sum cannot drift
+            self.volume_sum = sum(volumes)
+
+        self.samples = samples + 1
 
     def is_ready(self):
-        return self.roc_window.is_ready and self.volume_window_data.is_ready and self.atr.is_ready
+        # Same warm-up as the former RollingWindow(roc_lookback + 5) / RollingWindow(volume_window) pair
+        return self.samples >= self.roc_lookback + 5 and self.samples >= self.volume_window and self.atr.is_ready
 
     def roc_today(self):
-        return ((self.roc_window[0] - self.roc_window[self.roc_lookback]) / self.roc_window[self.roc_lookback]) * 100
+        return self.rocs[(self.samples - 1) % self.ROC_HISTORY]
 
     def roc_yesterday(self):
-        return ((self.roc_window[1] - self.roc_window[self.roc_lookback + 1]) / self.roc_window[self.roc_lookback + 1]) * 100
+        return self.rocs[(self.samples - 2) % self.ROC_HISTORY]
 
     def roc_3days_ago(self):
-        return ((self.roc_window[3] - self.roc_window[self.roc_lookback + 3]) / self.roc_window[self.roc_lookback + 3]) * 100
+        return self.rocs[(self.samples - 4) % self.ROC_HISTORY]
+
+    def price_change(self):
+        # Close today minus close roc_lookback bars ago, i.e. the move behind roc_today
+        closes = self.closes
+        return closes[(self.samples - 1) % len(closes)] - closes[(self.samples - 1 - self.roc_lookback) % len(closes)]
 
     def average_volume(self):
-        if not self.volume_window_data.is_ready:
+        if self.samples < self.volume_window:
             return 0
-        total_volume = sum(self.volume_window_data)
-        return total_volume / self.volume_window_data.count
+        return self.volume_sum / self.volume_window
 
     def current_volume(self):
-        return self.volume_window_data[0] if self.volume_window_data.is_ready else 0
+        return self.volumes[(self.samples - 1) % self.volume_window] if self.samples >= self.volume_window else 0
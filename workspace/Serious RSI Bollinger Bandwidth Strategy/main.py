@@ -1,4 +1,12 @@
 from AlgorithmImports import *
+from talib.logger import LoggerMixin
+from talib.indicator_bank import IndicatorBank
+from talib.consolidation import ConsolidationPool
+from talib.recorder import SignalRecorder
+from talib.portfolio_state import PortfolioStateCache
+from time import perf_counter
+from symbol_state import SymbolStateArrays
+import numpy as np
 
 class SP500ConstituentStrategy(QCAlgorithm):
     def Initialize(self):
@@ -21,9 +29,15 @@ class SP500ConstituentStrategy(QCAlgorithm):
         self.atr_tp_multiplier = self.GetParameter("atr_tp_multiplier", 2.0)
         self.atr_sl_multiplier = self.GetParameter("atr_sl_multiplier", 3.0)
         self.position_timeout_bars = self.GetParameter("position_timeout_bars", 2)
+        self.resolution_mode = self.GetParameter("resolution_mode", "daily")
+        self.consolidation_minutes = int(self.GetParameter("consolidation_minutes", 30))
+        self.signal_recorder = self.GetParameter("signal_recorder", "")  # object store key, empty disables recording
         
-        # Set resolution to daily
-        self.resolution = Resolution.Daily
+        # Daily bars, or minute data consolidated into consolidation_minutes bars. The indicator bank does
+        # not consolidate, so the universe must deliver daily bars in daily mode
+        self.intraday = self.resolution_mode == "minute"
+        self.resolution = Resolution.Minute if self.intraday else Resolution.Daily
+        self.UniverseSettings.Resolution = self.resolution
         
         # Get indicator periods from parameters
         self.bbperiod = int(self.bb_period)
@@ -32,7 +46,10 @@ class SP500ConstituentStrategy(QCAlgorithm):
         
         # Warm up period to ensure indicators have enough data
         warmup_period = max(self.bbperiod, self.rsi_period, self.atr_period) + 1
-        self.SetWarmup(warmup_period)
+        if self.intraday:
+            self.SetWarmup(warmup_period * self.consolidation_minutes, Resolution.Minute)
+        else:
+            self.SetWarmup(warmup_period)
         
         # Set benchmark to SPY
         self.SetBenchmark("SPY")
@@ -43,20 +60,39 @@ class SP500ConstituentStrategy(QCAlgorithm):
         # Create Universe Selection Model
         self.SetUniverseSelection(ETFConstituentsUniverseSelectionModel(self.spy))
         
-        # Dictionary to store indicators for each symbol
-        self.indicators = {}
-        
         # Set thresholds based on resolution
         self.rsi_threshold = float(self.rsi_threshold)
-        self.bb_width_threshold = float(self.bb_width_threshold_daily)  # Using daily threshold
+        self.bb_width_threshold = float(self.bb_width_threshold_minute if self.intraday else self.bb_width_threshold_daily)
+        
+        # Track state for each symbol in slot-indexed arrays
+        self.state = SymbolStateArrays()
+        
+        # Open positions maintained from fills, reconciled with the portfolio once a day
+        self.portfolio_state = PortfolioStateCache(self)
+        
+        # One fused BB/RSI/ATR bank for the whole universe instead of three engine indicators per symbol
+        self.indicators = IndicatorBank(self.bbperiod, float(self.bb_std_dev), self.rsi_period, self.atr_period,
+                                        rsi_average="simple", atr_average="simple")
+        
+        # Intraday mode: one engine consolidator per symbol, drained as a single batch per period
+        self.consolidation = ConsolidationPool(self, timedelta(minutes=self.consolidation_minutes)) if self.intraday else None
+        
+        # Opt-in per-bar snapshot of every evaluated symbol's features and state flags
+        self.recorder = None
+        if self.signal_recorder:
+            self.recorder = SignalRecorder(self.ObjectStore.GetFilePath(self.signal_recorder), [
+                ("close", "f8"), ("low", "f8"), ("previous_close", "f8"), ("lower", "f8"), ("upper", "f8"),
+                ("bb_width", "f4"), ("rsi", "f4"), ("atr", "f4"), ("bars_held", "i4"),
+                ("red_signal", "?"), ("looking", "?"), ("confirmed", "?"), ("missed", "?"),
+                ("invested", "?"), ("exited", "?"), ("entered", "?"),
+            ])
         
-        # Track state for each symbol
-        self.previous_bars = {}
-        self.last_red_candles = {}
-        self.looking_for_green_confirmation = {}
-        self.stop_loss_prices = {}  # Store stop loss prices
-        self.take_profit_prices = {}  # Store take profit prices
-        self.position_entry_bar_count = {}  # Track bars since entry
+        # Per-minute overhead of the intraday mode
+        self.minutes = 0
+        self.symbol_minutes = 0
+        self.minute_seconds = 0.0
+        self.consolidated_seconds = 0.0
+        self.intraday_exit_checks = 0
         
         # Position management from parameters
         self.max_position_size_per_stock = float(self.max_position_size_per_stock)
@@ -64,194 +100,238 @@ class SP500ConstituentStrategy(QCAlgorithm):
         
         # Logging level configuration
         self.log_level = self.GetParameter("log_level", 1)
+        self.logger = LoggerMixin(self)
         
         # Log parameters for tracking
-        self.log(1, f"Strategy Parameters:")
-        self.log(1, f"BB Period: {self.bbperiod}, BB Std Dev: {self.bb_std_dev}")
-        self.log(1, f"RSI Period: {self.rsi_period}, RSI Threshold: {self.rsi_threshold}")
-        self.log(1, f"BB Width Threshold (Daily): {self.bb_width_threshold_daily}")
-        self.log(1, f"BB Width Threshold (Minute): {self.bb_width_threshold_minute}")
-        self.log(1, f"RSI Exit Threshold: {self.rsi_exit_threshold}")
-        self.log(1, f"Max Position Size: {self.max_position_size_per_stock}")
-        self.log(1, f"Max Total Positions: {self.max_total_positions}")
-        self.log(1, f"ATR Period: {self.atr_period}")
-        self.log(1, f"ATR Take Profit Multiplier: {self.atr_tp_multiplier}")
-        self.log(1, f"ATR Stop Loss Multiplier: {self.atr_sl_multiplier}")
-        self.log(1, f"Log Level: {self.log_level}")
+        self.log(1, "Strategy Parameters:")
+        self.log(1, "BB Period: {}, BB Std Dev: {}", self.bbperiod, self.bb_std_dev)
+        self.log(1, "RSI Period: {}, RSI Threshold: {}", self.rsi_period, self.rsi_threshold)
+        self.log(1, "BB Width Threshold (Daily): {}", self.bb_width_threshold_daily)
+        self.log(1, "BB Width Threshold (Minute): {}", self.bb_width_threshold_minute)
+        self.log(1, "Resolution Mode: {}, Consolidation Minutes: {}", self.resolution_mode, self.consolidation_minutes)
+        self.log(1, "Signal Recorder: {}", self.signal_recorder or "off")
+        self.log(1, "RSI Exit Threshold: {}", self.rsi_exit_threshold)
+        self.log(1, "Max Position Size: {}", self.max_position_size_per_stock)
+        self.log(1, "Max Total Positions: {}", self.max_total_positions)
+        self.log(1, "ATR Period: {}", self.atr_period)
+        self.log(1, "ATR Take Profit Multiplier: {}", self.atr_tp_multiplier)
+        self.log(1, "ATR Stop Loss Multiplier: {}", self.atr_sl_multiplier)
+        self.log(1, "Log Level: {}", self.log_level)
     
-    def log(self, level: int, message: str):
+    def log(self, level: int, message: str, *args):
+        # Gate on the verbosity before anything is formatted; pass format args, not f-strings
         if self.log_level >= level:
-            self.Debug(message)
+            self.logger.log(message, *args, level="debug")
+        else:
+            self.logger.suppressed_by_level += 1
+    
+    def OnEndOfAlgorithm(self):
+        if self.intraday and self.minutes:
+            self.log(1, "Intraday overhead: {} minutes, {:.1f} us per minute, {:.3f} us per symbol-minute, " +
+                      "{:.1f} us per consolidated batch, {} intraday exit checks",
+                      self.minutes, 1e6 * self.minute_seconds / self.minutes,
+                      1e6 * self.minute_seconds / max(self.symbol_minutes, 1),
+                      1e6 * self.consolidated_seconds / max(self.consolidation.batches, 1), self.intraday_exit_checks)
+        self.log(1, "Portfolio state: {} fills, {} reconciliations, {} drift corrections", self.portfolio_state.fills,
+                  self.portfolio_state.reconciliations, self.portfolio_state.drift_corrections)
+        if self.recorder:
+            self.recorder.close()
+            self.log(1, "Signal recorder: {} rows in {} bars, {:.1f} us per bar",
+                      self.recorder.rows, self.recorder.appends, 1e6 * self.recorder.seconds / max(self.recorder.appends, 1))
+        self.logger.report()
     
     def OnSecuritiesChanged(self, changes):
         # Add indicators for new securities
         for security in changes.AddedSecurities:
             symbol = security.Symbol
-            if symbol not in self.indicators:
-                # Initialize indicators for daily resolution
-                self.indicators[symbol] = {
-                    'bb': self.BB(symbol, self.bbperiod, float(self.bb_std_dev), MovingAverageType.Simple, self.resolution),
-                    'rsi': self.RSI(symbol, self.rsi_period, MovingAverageType.Simple, self.resolution),
-                    'atr': self.ATR(symbol, self.atr_period, MovingAverageType.Simple, self.resolution)
-                }
-                
-                self.previous_bars[symbol] = None
-                self.last_red_candles[symbol] = None
-                self.looking_for_green_confirmation[symbol] = False
-                self.stop_loss_prices[symbol] = None
-                self.take_profit_prices[symbol] = None
-                self.position_entry_bar_count[symbol] = 0
+            if symbol not in self.state:
+                self.state.add(symbol)
+                self.indicators.add(symbol)
+                if self.intraday:
+                    self.consolidation.add(symbol)
+                self.state.invested[self.state.slots[symbol]] = self.portfolio_state.is_invested(symbol)
         
         # Clean up indicators for removed securities
         for security in changes.RemovedSecurities:
-            symbol = security.Symbol
-            if symbol in self.indicators:
-                del self.indicators[symbol]
-                del self.previous_bars[symbol]
-                del self.last_red_candles[symbol]
-                del self.looking_for_green_confirmation[symbol]
-                del self.stop_loss_prices[symbol]
-                del self.take_profit_prices[symbol]
-                del self.position_entry_bar_count[symbol]
+            self.state.remove(security.Symbol)
+            self.indicators.remove(security.Symbol)
+            if self.intraday:
+                self.consolidation.remove(security.Symbol)
+    
+    def OnOrderEvent(self, order_event):
+        self.portfolio_state.on_order_event(order_event)
+        if order_event.Status != OrderStatus.Filled:
+            return
+        slot = self.state.slots.get(order_event.Symbol)
+        if slot is not None:
+            self.state.invested[slot] = self.portfolio_state.is_invested(order_event.Symbol)
     
     def OnData(self, data):
+        if self.intraday:
+            self.on_minute_data(data)
+            return
+        
+        # Every bar goes through the indicator bank once, warm-up included
+        self.indicators.update(data.Bars)
+        
         # Skip trading during warmup period
         if self.IsWarmingUp:
             return
         
-        # Check if we have reached maximum positions
-        current_positions = 0
-        for kvp in self.Portfolio:
-            if kvp.Value.Invested:
-                current_positions += 1
-        
-        for symbol in self.indicators:
-            if not data.ContainsKey(symbol):
+        # Gather the bars of the symbols that printed
+        symbols, closes, lows, highs = [], [], [], []
+        for symbol, bar in data.Bars.items():
+            if symbol not in self.state:
                 continue
-            
-            # Check if indicators are ready for this symbol
-            indicators = self.indicators[symbol]
-            if not indicators['bb'].IsReady or not indicators['rsi'].IsReady or not indicators['atr'].IsReady:
+            symbols.append(symbol)
+            closes.append(bar.Close)
+            lows.append(bar.Low)
+            highs.append(bar.High)
+        if symbols:
+            self.evaluate(symbols, np.array(highs), np.array(lows), np.array(closes))
+    
+    def on_minute_data(self, data):
+        start = perf_counter()
+        
+        # Only symbols with an open position do Python work every minute
+        self.check_intraday_exits(data)
+        
+        # Consolidated bars of the whole universe arrive as one batch per period
+        batch = self.consolidation.drain()
+        if batch is not None:
+            symbols, _, highs, lows, closes, _ = batch
+            keep = [i for i, symbol in enumerate(symbols) if symbol in self.state]
+            if keep:
+                symbols = [symbols[i] for i in keep]
+                highs, lows, closes = highs[keep], lows[keep], closes[keep]
+                bank_slots = np.array([self.indicators.slots[symbol] for symbol in symbols], dtype=np.int64)
+                self.indicators.update_arrays(bank_slots, highs, lows, closes)
+                if not self.IsWarmingUp:
+                    self.evaluate(symbols, highs, lows, closes)
+            self.consolidated_seconds += perf_counter() - start
+        
+        self.minutes += 1
+        self.symbol_minutes += len(self.state)
+        self.minute_seconds += perf_counter() - start
+    
+    def check_intraday_exits(self, data):
+        state = self.state
+        pending = np.flatnonzero(state.invested & ~np.isnan(state.stop_loss))
+        for slot in pending:
+            symbol = state.symbols[slot]
+            if symbol not in data.Bars:
                 continue
-            
-            if not data.Bars.ContainsKey(symbol):
+            self.intraday_exit_checks += 1
+            price = data.Bars[symbol].Close
+            if price <= state.stop_loss[slot]:
+                self.Liquidate(symbol)
+                self.log(1, "{} STOP LOSS HIT (intraday) | Price: {:.2f} | SL: {:.2f}", symbol, price, state.stop_loss[slot])
+            elif price >= state.take_profit[slot]:
+                self.Liquidate(symbol)
+                self.log(1, "{} TAKE PROFIT HIT (intraday) | Price: {:.2f} | TP: {:.2f}", symbol, price, state.take_profit[slot])
+            else:
                 continue
-                
-            current_bar = data.Bars[symbol]
-            
-            # Skip if we don't have previous bar data
-            if self.previous_bars[symbol] is None:
-                self.previous_bars[symbol] = current_bar
+            state.reset_position(slot)
+    
+    def evaluate(self, symbols, high, low, close):
+        '''Runs the state machine on one bar per symbol: daily bars or consolidated intraday bars.'''
+        # Check if we have reached maximum positions
+        if self.portfolio_state.maybe_reconcile():
+            # Holdings changed outside of fills: resync the state machine's invested flags
+            state = self.state
+            for symbol, slot in state.slots.items():
+                state.invested[slot] = self.portfolio_state.is_invested(symbol)
+        current_positions = len(self.portfolio_state)
+        
+        # Keep the symbols whose indicators are ready
+        state = self.state
+        indicators = self.indicators
+        bank_slots = np.array([indicators.slots[symbol] for symbol in symbols], dtype=np.int64)
+        ready = indicators.is_ready(bank_slots)
+        if not ready.any():
+            return
+        slots = np.array([state.slots[symbol] for symbol in symbols], dtype=np.int64)[ready]
+        bank_slots = bank_slots[ready]
+        close, low, high = close[ready], low[ready], high[ready]
+        lower, upper, middle = indicators.lower[bank_slots], indicators.upper[bank_slots], indicators.middle[bank_slots]
+        rsi, atr = indicators.rsi[bank_slots], indicators.atr[bank_slots]
+        
+        # Skip symbols without previous bar data; the current bar becomes their previous bar
+        previous_close = state.prev_close[slots]
+        has_previous = ~np.isnan(previous_close)
+        state.prev_close[slots] = close
+        
+        # Calculate Bollinger Band Width (percentage)
+        bb_width = ((upper - lower) / middle) * 100
+        is_red_candle = close < previous_close
+        is_green_candle = close > previous_close
+        wide_bands = bb_width > self.bb_width_threshold
+        
+        # Entry Signal - Step 1: Red candle with low below the lower band, low RSI and wide bands
+        red_signal = has_previous & is_red_candle & (low < lower) & (rsi < self.rsi_threshold) & wide_bands
+        
+        # Entry Signal - Step 2: Green candle closing above the red candle's high (Trigger Candle)
+        looking = state.looking[slots]
+        red_high = state.red_high[slots]
+        confirmed = has_previous & ~red_signal & looking & ~np.isnan(red_high) & is_green_candle & (close > red_high) & wide_bands
+        
+        # Reset if we missed the confirmation
+        missed = has_previous & ~red_signal & ~confirmed & looking & is_red_candle
+        
+        state.red_high[slots[red_signal]] = high[red_signal]
+        state.looking[slots[red_signal]] = True
+        state.reset_confirmation(slots[confirmed | missed])
+        
+        # Exit conditions: timeout first, then ATR-based stop loss and take profit
+        held = has_previous & state.invested[slots]
+        state.bars_held[slots[held]] += 1
+        bars_held = state.bars_held[slots]
+        timeout = held & (bars_held >= int(self.position_timeout_bars))
+        stop_loss = state.stop_loss[slots]
+        take_profit = state.take_profit[slots]
+        stop_hit = held & ~timeout & (close <= stop_loss)
+        take_profit_hit = held & ~timeout & ~stop_hit & (close >= take_profit)
+        
+        for i in np.flatnonzero(timeout | stop_hit | take_profit_hit):
+            symbol = state.symbols[slots[i]]
+            self.Liquidate(symbol)
+            current_positions -= 1
+            if timeout[i]:
+                self.log(1, "{} TIMEOUT EXIT | Bars since entry: {} | Price: {:.2f}", symbol, bars_held[i], close[i])
+            elif stop_hit[i]:
+                self.log(1, "{} STOP LOSS HIT | Price: {:.2f} | SL: {:.2f}", symbol, close[i], stop_loss[i])
+            else:
+                self.log(1, "{} TAKE PROFIT HIT | Price: {:.2f} | TP: {:.2f}", symbol, close[i], take_profit[i])
+            state.reset_position(slots[i])
+        
+        # Enter confirmed positions if we haven't reached max positions
+        entered = np.zeros(len(slots), dtype=bool)
+        for i in np.flatnonzero(confirmed):
+            slot = slots[i]
+            if state.invested[slot] or current_positions >= self.max_total_positions:
                 continue
+            symbol = state.symbols[slot]
+            entry_price = close[i]
+            self.SetHoldings(symbol, self.max_position_size_per_stock)
+            current_positions += 1
+            entered[i] = True
             
-            previous_bar = self.previous_bars[symbol]
-            
-            # Get current indicator values
-            bb = indicators['bb']
-            rsi = indicators['rsi']
-            atr = indicators['atr']
-            lower_bollinger = bb.LowerBand.Current.Value
-            current_rsi = rsi.Current.Value
-            current_atr = atr.Current.Value
-            
-            # Calculate Bollinger Band Width (percentage)
-            upper_bollinger = bb.UpperBand.Current.Value
-            bb_width = ((upper_bollinger - lower_bollinger) / bb.MiddleBand.Current.Value) * 100
-            
-            # Check for red candle with low below lower Bollinger Band
-            is_red_candle = current_bar.Close < previous_bar.Close
-            low_below_bb = current_bar.Low < lower_bollinger
-            
-            # Debug log to check bar values
-            self.log(3, f"{symbol} Bars - Previous Close: {previous_bar.Close:.2f}, Current Close: {current_bar.Close:.2f}")
+            # Use ATR from the trigger (green) candle
+            atr_value = atr[i]
+            state.stop_loss[slot] = entry_price - (float(self.atr_sl_multiplier) * atr_value)
+            state.take_profit[slot] = entry_price + (float(self.atr_tp_multiplier) * atr_value)
+            # The entry bar counts as the first bar held once the order has filled
+            state.bars_held[slot] = 1 if state.invested[slot] else 0
             
-            # Entry Signal - Step 1: Red candle with conditions
-            if (is_red_candle and 
-                low_below_bb and 
-                current_rsi < self.rsi_threshold and 
-                bb_width > self.bb_width_threshold):
-                
-                self.last_red_candles[symbol] = current_bar
-                self.looking_for_green_confirmation[symbol] = True
-                
-                self.log(2, f"{symbol} RED CANDLE SIGNAL | Price: {current_bar.Close:.2f} | " +
-                          f"Low: {current_bar.Low:.2f} | BB Lower: {lower_bollinger:.2f} | " +
-                          f"RSI: {current_rsi:.2f} | BB Width: {bb_width:.2f} | ATR: {current_atr:.2f}")
-                self.log(3, f"{symbol} BB Calc: Upper: {upper_bollinger:.2f} | Middle: {bb.MiddleBand.Current.Value:.2f} | " +
-                          f"Std Multiplier: {self.bb_std_dev}")
-            
-            # Entry Signal - Step 2: Green candle confirmation (Trigger Candle)
-            elif (self.looking_for_green_confirmation[symbol] and 
-                  self.last_red_candles[symbol] is not None and
-                  current_bar.Close > previous_bar.Close and  # Green candle
-                  current_bar.Close > self.last_red_candles[symbol].High and  # Closes above previous red high
-                  bb_width > self.bb_width_threshold):  # BB width must be above threshold on green candle
-                
-                # Enter position if we haven't reached max positions
-                if not self.Portfolio[symbol].Invested and current_positions < self.max_total_positions:
-                    entry_price = current_bar.Close
-                    self.SetHoldings(symbol, self.max_position_size_per_stock)
-                    current_positions += 1
-                    
-                    # Use ATR from the trigger (green) candle
-                    atr_value = current_atr  # ATR from current (green) candle, not from red candle
-                    self.stop_loss_prices[symbol] = entry_price - (float(self.atr_sl_multiplier) * atr_value)
-                    self.take_profit_prices[symbol] = entry_price + (float(self.atr_tp_multiplier) * atr_value)
-                    self.position_entry_bar_count[symbol] = 0  # Reset bar counter
-                    
-                    self.log(1, f"{symbol} ENTRY CONFIRMED | Entry: {entry_price:.2f} | " +
-                              f"SL: {self.stop_loss_prices[symbol]:.2f} | " +
-                              f"TP: {self.take_profit_prices[symbol]:.2f} | " +
-                              f"ATR: {atr_value:.2f} | BB Width: {bb_width:.2f}")
-                
-                # Reset flags
-                self.looking_for_green_confirmation[symbol] = False
-                self.last_red_candles[symbol] = None
-            
-            # Reset if we missed the confirmation
-            elif self.looking_for_green_confirmation[symbol] and current_bar.Close < previous_bar.Close:
-                self.looking_for_green_confirmation[symbol] = False
-                self.last_red_candles[symbol] = None
-                self.log(3, f"{symbol} Confirmation missed - resetting")
-            
-            # Exit conditions
-            if self.Portfolio[symbol].Invested:
-                # Increment bar count for position
-                self.position_entry_bar_count[symbol] += 1
-                
-                # Check timeout condition first
-                if self.position_entry_bar_count[symbol] >= int(self.position_timeout_bars):
-                    self.Liquidate(symbol)
-                    current_positions -= 1
-                    self.log(1, f"{symbol} TIMEOUT EXIT | Bars since entry: {self.position_entry_bar_count[symbol]} | " +
-                              f"Price: {current_bar.Close:.2f}")
-                    self.stop_loss_prices[symbol] = None
-                    self.take_profit_prices[symbol] = None
-                    self.position_entry_bar_count[symbol] = 0
-                
-                # Check ATR-based stop loss and take profit
-                elif (self.stop_loss_prices[symbol] is not None and 
-                    current_bar.Close <= self.stop_loss_prices[symbol]):
-                    self.Liquidate(symbol)
-                    current_positions -= 1
-                    self.log(1, f"{symbol} STOP LOSS HIT | Price: {current_bar.Close:.2f} | " +
-                              f"SL: {self.stop_loss_prices[symbol]:.2f}")
-                    self.stop_loss_prices[symbol] = None
-                    self.take_profit_prices[symbol] = None
-                    self.position_entry_bar_count[symbol] = 0
-                
-                elif (self.take_profit_prices[symbol] is not None and 
-                      current_bar.Close >= self.take_profit_prices[symbol]):
-                    self.Liquidate(symbol)
-                    current_positions -= 1
-                    self.log(1, f"{symbol} TAKE PROFIT HIT | Price: {current_bar.Close:.2f} | " +
-                              f"TP: {self.take_profit_prices[symbol]:.2f}")
-                    self.stop_loss_prices[symbol] = None
-                    self.take_profit_prices[symbol] = None
-                    self.position_entry_bar_count[symbol] = 0
-            
-            # Update previous bar for next iteration
-            self.previous_bars[symbol] = current_bar
+            self.log(1, "{} ENTRY CONFIRMED | Entry: {:.2f} | SL: {:.2f} | TP: {:.2f} | ATR: {:.2f} | BB Width: {:.2f}",
+                      symbol, entry_price, state.stop_loss[slot], state.take_profit[slot], atr_value, bb_width[i])
+        
+        if self.recorder:
+            self.recorder.append(self.Time, [state.symbols[slot] for slot in slots],
+                                 close=close, low=low, previous_close=previous_close, lower=lower, upper=upper,
+                                 bb_width=bb_width, rsi=rsi, atr=atr, bars_held=bars_held,
+                                 red_signal=red_signal, looking=looking, confirmed=confirmed, missed=missed,
+                                 invested=held, exited=timeout | stop_hit | take_profit_hit, entered=entered)
         
         # Log current positions
-        self.log(2, f"Current positions: {current_positions}/{self.max_total_positions}")
+        self.log(2, "Current positions: {}/{}", current_positions, self.max_total_positions)
@@ -0,0 +1,72 @@
+# region imports
+from AlgorithmImports import *
+# endregion
+import numpy as np
+
+class SymbolStateArrays:
+    '''Struct-of-arrays state for the red-candle / green-confirmation state machine.
+
+    Every constituent owns an integer slot into a set of NumPy arrays, so adding or removing a
+    symbol is a slot allocation and the state machine can be evaluated for all symbols that
+    printed in one vectorized step. NaN marks "not set" in the float fields.'''
+
+    FIELDS = {
+        "prev_close": (np.float64, np.nan),   # close of the previous evaluated bar
+        "red_high": (np.float64, np.nan),     # high of the red candle awaiting confirmation
+        "looking": (np.bool_, False),         # waiting for the green confirmation candle
+        "stop_loss": (np.float64, np.nan),
+        "take_profit": (np.float64, np.nan),
+        "bars_held": (np.int64, 0),           # bars since entry
+        "invested": (np.bool_, False),        # mirrored from fills in OnOrderEvent
+    }
+
+    def __init__(self, capacity=512):
+        for name, (dtype, default) in self.FIELDS.items():
+            setattr(self, name, np.full(capacity, default, dtype=dtype))
+        self.symbols = [None] * capacity
+        self.slots = {}  # {symbol: slot}
+        self.free_slots = list(range(capacity - 1, -1, -1))
+
+    def __contains__(self, symbol):
+        return symbol in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, symbol):
+        if not self.free_slots:
+            self._grow()
+        slot = self.free_slots.pop()
+        self.slots[symbol] = slot
+        self.symbols[slot] = symbol
+        self.reset(slot)
+        return slot
+
+    def remove(self, symbol):
+        slot = self.slots.pop(symbol, None)
+        if slot is None:
+            return None
+        self.symbols[slot] = None
+        self.reset(slot)
+        self.free_slots.append(slot)
+        return slot
+
+    def reset(self, slots):
+        for name, (_, default) in self.FIELDS.items():
+            getattr(self, name)[slots] = default
+
+    def reset_confirmation(self, slots):
+        self.looking[slots] = False
+        self.red_high[slots] = np.nan
+
+    def reset_position(self, slots):
+        self.stop_loss[slots] = np.nan
+        self.take_profit[slots] = np.nan
+        self.bars_held[slots] = 0
+
+    def _grow(self):
+        capacity = len(self.symbols)
+        for name, (dtype, default) in self.FIELDS.items():
+            setattr(self, name, np.concatenate([getattr(self, name), np.full(capacity, default, dtype=dtype)]))
+        self.symbols.extend([None] * capacity)
+        self.free_slots.extend(range(2 * capacity - 1, capacity - 1, -1))